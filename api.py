@@ -1,21 +1,111 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from fastapi.responses import HTMLResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.requests import Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+import hashlib
+import json
 import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
 
-# Import model-specific logic
-from backend.model_defs.text_model import predict_text
-from backend.model_defs.video_model import predict_video
-# from model_defs.image_model import predict_image  # optional for later
+# Sets OpenCV's decoder pixel cap, so it must load before anything imports cv2
+from backend import image_ingest  # noqa: F401
+from backend.batching import MicroBatcher
+from backend.cache import ResultCache, content_key
+from backend.documents import DOCUMENT_BATCH_SIZE, DocumentSegmenter, DocumentVerdict
+from backend.executor import SHARED_MODALITIES, ExecutorSaturatedError, InferenceExecutor
+from backend.jobs import JobManager
+from backend.media import artifact_store
+from backend.metrics import (
+    PROFILE_HEADER,
+    PROFILING_ENABLED,
+    render_metric,
+    request_seconds,
+    server_timing,
+    stage_seconds,
+    start_profile,
+)
+from backend.lifecycle import LifecycleManager, ModalityUnavailableError, model_memory_report
+from backend.uploads import (
+    MAX_DOCUMENT_BYTES,
+    MAX_IMAGE_UPLOAD_BYTES,
+    MAX_VIDEO_UPLOAD_BYTES,
+    UPLOAD_CHUNK_SIZE,
+    UploadTooLargeError,
+    read_upload,
+    save_body,
+    save_upload,
+    spooled_upload,
+)
+from backend.workers import combine_cache_stats
+
+# Most items accepted by a single batch request
+TEXT_BATCH_MAX_ITEMS = int(os.environ.get("TEXT_BATCH_MAX_ITEMS", "256"))
+IMAGE_BATCH_MAX_FILES = int(os.environ.get("IMAGE_BATCH_MAX_FILES", "32"))
+
+# Model-specific modules (TensorFlow, torch, LIME...) are imported on first
+# use or by the background warm-up, never at import time
+lifecycle = LifecycleManager()
+
+# Blocking inference runs here, never on the event loop
+executor = InferenceExecutor()
+
+# Long videos run as background jobs that stream their progress
+video_jobs = JobManager(executor=executor)
+
+# Repeat submissions of the same content are answered from here
+result_cache = ResultCache()
+
+async def cached(key, compute, cache=True):
+    """Return the cached result for key, or await compute() and cache it unless it failed"""
+    if not cache:
+        return await compute()
+    result = result_cache.get(key)
+    if result is None:
+        result = await compute()
+        if isinstance(result, dict) and "error" not in result:
+            result_cache.put(key, result)
+    return result
+
+# Errors that should reach their exception handlers rather than become {"error": ...}
+SERVICE_ERRORS = (ExecutorSaturatedError, ModalityUnavailableError)
+
+# Concurrent text requests share one vectorizer + model call
+async def _score_text_batch(texts):
+    text_model = await lifecycle.get("text")
+    return await executor.run("text", text_model.score_texts, texts)
+
+text_batcher = MicroBatcher(_score_text_batch)
+
+def load_shared_modalities():
+    for modality in SHARED_MODALITIES:
+        try:
+            lifecycle.load(modality)
+        except ModalityUnavailableError:
+            # Disabled or failed; recorded by the lifecycle manager
+            pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # "shared" workers fork from a process that already holds the image/video weights
+    await executor.start(load_shared_modalities)
+    lifecycle.start()
+    video_jobs.start()
+    yield
+    video_jobs.stop()
+    lifecycle.stop()
+    executor.shutdown()
 
 app = FastAPI(
     title="Multimodal AI Content Detection API",
     description="Detects AI-generated content in text, images, and video",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Serve static files and Jinja2 templates
@@ -30,8 +120,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Per-route latency histogram, plus a Server-Timing stage breakdown when PROFILE_HEADER is sent"""
+    profile = start_profile() if PROFILING_ENABLED and request.headers.get(PROFILE_HEADER) else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        route = request.scope.get("route")
+        # Route templates, not raw paths, so job ids and artifact names don't explode the series
+        route_path = route.path if route is not None else "unmatched"
+        request_seconds.observe((request.method, route_path, str(status)), elapsed)
+    if profile is not None:
+        response.headers["Server-Timing"] = server_timing(profile, total=elapsed)
+    return response
+
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(request: Request, exc: UploadTooLargeError):
+    return JSONResponse(status_code=413, content={"error": str(exc)})
+
+@app.exception_handler(ExecutorSaturatedError)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturatedError):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={
+            "error": str(exc),
+            "modality": exc.modality,
+            "queue_depth": exc.queue_depth,
+            "max_queue": exc.max_queue
+        }
+    )
+
+@app.exception_handler(ModalityUnavailableError)
+async def modality_unavailable_handler(request: Request, exc: ModalityUnavailableError):
+    return JSONResponse(status_code=503, content={"error": str(exc), "modality": exc.modality})
+
 # ----------- TEXT DETECTION -----------
 class TextInput(BaseModel):
     text: str
@@ -39,46 +170,462 @@ class TextInput(BaseModel):
 class TextDetectionRequest(BaseModel):
     text: str
     explain: bool = False
+    # LIME fidelity vs latency: perturbed samples scored and features reported
+    # (the text model's defaults apply when left out)
+    num_samples: Optional[int] = Field(None, ge=10, le=5000)
+    num_features: Optional[int] = Field(None, ge=1, le=50)
+
+class TextBatchRequest(BaseModel):
+    texts: List[str] = Field(..., max_length=TEXT_BATCH_MAX_ITEMS)
+
+async def classify_text(text):
+    """Label one text through the micro-batcher"""
+    text_model = await lifecycle.get("text")
+    return text_model.label_score(await text_batcher.submit(text))
 
 @app.post("/predict")
-def text_detection(input_data: TextInput):
+async def text_detection(input_data: TextInput):
     """
     Detect if the input text is AI-generated or human-written.
     """
-    return predict_text(input_data.text)
+    try:
+        text_model = await lifecycle.get("text")
+        key = content_key("text", input_data.text, text_model.MODEL_VERSION)
+        return await cached(key, lambda: classify_text(input_data.text))
+    except SERVICE_ERRORS:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
 
 @app.post("/text-detect")
 async def detect_text(request: TextDetectionRequest):
     """
     Detect if the input text is AI-generated or human-written with optional explanations.
     """
-    try:
-        result = predict_text(request.text, explain=request.explain)
+    async def compute():
+        result = await classify_text(request.text)
+
+        # Add LIME explanations if requested
+        if request.explain:
+            lime_options = {}
+            if request.num_features is not None:
+                lime_options["num_features"] = request.num_features
+            if request.num_samples is not None:
+                lime_options["num_samples"] = request.num_samples
+            result.update(await executor.run(
+                "text",
+                text_model.generate_lime_explanation,
+                request.text,
+                result["label"],
+                **lime_options
+            ))
+
         return result
+
+    try:
+        text_model = await lifecycle.get("text")
+        key = content_key(
+            "text",
+            request.text,
+            text_model.MODEL_VERSION,
+            explain=request.explain,
+            num_samples=request.num_samples,
+            num_features=request.num_features
+        )
+        return await cached(key, compute)
+    except SERVICE_ERRORS:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/text-detect/batch")
+async def detect_text_batch(request: TextBatchRequest):
+    """
+    Detect AI-generated text for a list of texts in batched model calls.
+    Results come back in input order, with per-item errors.
+    """
+    text_model = await lifecycle.get("text")
+    keys = [content_key("text", text, text_model.MODEL_VERSION) for text in request.texts]
+    results = [result_cache.get(key) for key in keys]
+
+    # Only texts missing from the cache go to the model
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        scored = await executor.run("text", text_model.predict_texts, [request.texts[i] for i in misses])
+        for i, result in zip(misses, scored):
+            results[i] = result
+            if "error" not in result:
+                result_cache.put(keys[i], result)
+
+    return {"results": results}
+
+@app.post("/text-detect/document")
+async def detect_text_document(
+    request: Request,
+    mode: Literal["sentence", "paragraph"] = "paragraph",
+    window: int = Query(1, ge=1, le=50)
+):
+    """
+    Score a long plain-text request body in windows of `window` sentences or paragraphs.
+    Streams NDJSON: one "segment" line per window as it is scored (with its character
+    offsets), then a "document" line with the length-weighted verdict.
+    The body is spooled to disk, then read, segmented and scored a batch at a time,
+    so memory stays bounded however long the document is.
+    """
+    text_model = await lifecycle.get("text")
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    await save_body(request, MAX_DOCUMENT_BYTES, path)
+
+    segmenter = DocumentSegmenter(mode, window)
+    verdict = DocumentVerdict()
+
+    async def score(segments):
+        scores = await executor.run("text", text_model.score_texts, [segment["text"] for segment in segments])
+        lines = []
+        for segment, segment_score in zip(segments, scores):
+            verdict.add(segment, segment_score)
+            line = {"type": "segment", "index": segment["index"], "start": segment["start"], "end": segment["end"]}
+            line.update(text_model.label_score(segment_score))
+            line["score"] = round(float(segment_score), 4)
+            lines.append(json.dumps(line) + "\n")
+        return lines
+
+    async def lines():
+        pending = []
+        try:
+            # newline="" keeps \r\n as sent, so segment offsets match the body
+            with open(path, encoding="utf-8", errors="replace", newline="") as document:
+                while True:
+                    chunk = document.read(UPLOAD_CHUNK_SIZE)
+                    if chunk:
+                        pending.extend(segmenter.feed(chunk))
+                    else:
+                        pending.extend(segmenter.close())
+                    # Score full batches as they fill, and whatever is left at the end
+                    while len(pending) >= DOCUMENT_BATCH_SIZE or (pending and not chunk):
+                        for line in await score(pending[:DOCUMENT_BATCH_SIZE]):
+                            yield line
+                        del pending[:DOCUMENT_BATCH_SIZE]
+                    if not chunk:
+                        break
+        except Exception as e:
+            # Headers are already sent; report the failure in-band and stop
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+            return
+        finally:
+            os.remove(path)
+
+        document = {"type": "document"}
+        summary = verdict.summary()
+        if summary["score"] is None:
+            document["error"] = "Empty text"
+        else:
+            document.update(text_model.label_score(summary["score"]))
+        document.update(summary)
+        yield json.dumps(document) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 
 # ----------- VIDEO DETECTION -----------
+class VideoOptions:
+    """Query options shared by /video-detect and /video-jobs"""
+
+    def __init__(
+        self,
+        sequence: bool = False,
+        adaptive: bool = False,
+        min_frames: Optional[int] = Query(None, ge=1, le=64),
+        max_frames: Optional[int] = Query(None, ge=1, le=128),
+        confidence_threshold: Optional[float] = Query(None, ge=0.5, le=1.0),
+        media: Literal["inline", "url", "none"] = "inline",
+        image_format: Optional[Literal["jpeg", "webp"]] = None,
+        image_quality: Optional[int] = Query(None, ge=1, le=100),
+        detect_faces: bool = True
+    ):
+        self.options = {
+            "sequence": sequence,
+            "adaptive": adaptive,
+            "min_frames": min_frames,
+            "max_frames": max_frames,
+            "confidence_threshold": confidence_threshold,
+            "media": media,
+            "image_format": image_format,
+            "image_quality": image_quality,
+            "detect_faces": detect_faces
+        }
+
 @app.post("/video-detect")
-async def video_detection(file: UploadFile = File(...)):
+async def video_detection(file: UploadFile = File(...), video_options: VideoOptions = Depends()):
     """
     Detect if a video contains deepfake content.
+    Set sequence=true to also score all frames as one sequence through the LSTM.
+    Set adaptive=true to sample frames only until the vote is confident
+    (between min_frames and max_frames, stopping at confidence_threshold).
+    media=inline|url|none embeds thumbnails, links them as short-lived
+    artifacts or leaves them out; image_format and image_quality set their encoding.
+    detect_faces=false skips face detection when no face boxes or counts are needed.
+    """
+    options = video_options.options
+    video_model = await lifecycle.get("video")
+    digest = hashlib.sha256()
+    async with spooled_upload(file, MAX_VIDEO_UPLOAD_BYTES, suffix=".mp4", digest=digest) as video_path:
+        key = content_key("video", digest, video_model.MODEL_VERSION, **options)
+        # Artifact URLs expire, so media=url results are never cached
+        return await cached(
+            key,
+            lambda: executor.run("video", video_model.predict_video, video_path, **options),
+            cache=options["media"] != "url"
+        )
+
+@app.post("/video-jobs", status_code=202)
+async def submit_video_job(file: UploadFile = File(...), video_options: VideoOptions = Depends()):
+    """
+    Queue a video for background analysis and return its job id immediately.
+    Follow progress at /video-jobs/{job_id}/events and fetch the outcome at /video-jobs/{job_id}.
     """
-    return await predict_video(file)
+    video_model = await lifecycle.get("video")
+    # Reject before streaming up to MAX_VIDEO_UPLOAD_BYTES to disk
+    video_jobs.check_capacity()
+    video_path = video_jobs.new_video_path()
+    await save_upload(file, MAX_VIDEO_UPLOAD_BYTES, video_path)
+    try:
+        job = video_jobs.submit(video_model.predict_video, video_path, **video_options.options)
+    except ExecutorSaturatedError:
+        os.remove(video_path)
+        raise
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "events_url": f"/video-jobs/{job.id}/events",
+        "result_url": f"/video-jobs/{job.id}"
+    }
 
+@app.get("/video-jobs/{job_id}")
+async def video_job_result(job_id: str):
+    """
+    Report a video job's status, with its result once finished.
+    """
+    summary = video_jobs.get(job_id)
+    if summary is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    return summary
+
+@app.get("/video-jobs/{job_id}/events")
+async def video_job_events(job_id: str):
+    """
+    Stream a video job's progress as Server-Sent Events: status changes,
+    stages, one "frame" event per frame prediction and a final "done" or "failed".
+    """
+    job = video_jobs.jobs.get(job_id)
+    if job is not None:
+        async def events():
+            async for event, data in job.follow():
+                yield sse_message(event, data)
+    else:
+        # Finished before a restart: replay just the stored outcome
+        summary = video_jobs.get(job_id)
+        if summary is None:
+            return JSONResponse(status_code=404, content={"error": "Unknown job"})
+        def events():
+            yield sse_message(summary["status"], summary.get("result"))
 
-# ----------- IMAGE DETECTION (Optional) -----------
-# Import the image model
-from backend.model_defs.image_model import predict_image
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
-# Update the image detection endpoint
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# ----------- IMAGE DETECTION -----------
 @app.post("/image-detect")
-async def image_detection(file: UploadFile = File(...)):
+async def image_detection(
+    file: UploadFile = File(...),
+    explain: bool = Form(False),
+    heatmap_grid: int = Form(4),
+    media: Literal["inline", "url", "none"] = Form("inline"),
+    image_format: Optional[Literal["jpeg", "webp"]] = Form(None),
+    image_quality: Optional[int] = Form(None, ge=1, le=100),
+    detect_faces: bool = Form(True)
+):
     """
     Detect if an image is AI-generated using the video model.
+    Set explain=true to also get an occlusion heatmap of heatmap_grid x heatmap_grid patches.
+    media=inline|url|none embeds the annotated image and heatmap, links them as
+    short-lived artifacts or leaves them out; image_format and image_quality set their encoding.
+    detect_faces=false skips face detection when no face boxes or count are needed.
+    """
+    image_model = await lifecycle.get("image")
+    if heatmap_grid not in image_model.HEATMAP_GRIDS:
+        return JSONResponse(status_code=400, content={"error": f"heatmap_grid must be one of {list(image_model.HEATMAP_GRIDS)}"})
+
+    contents = await read_upload(file, MAX_IMAGE_UPLOAD_BYTES)
+    options = {
+        "explain": explain,
+        "heatmap_grid": heatmap_grid,
+        "media": media,
+        "image_format": image_format,
+        "image_quality": image_quality,
+        "detect_faces": detect_faces
+    }
+    key = content_key("image", contents, image_model.MODEL_VERSION, **options)
+    # Artifact URLs expire, so media=url results are never cached
+    return await cached(
+        key,
+        lambda: executor.run("image", image_model.predict_image, contents, **options),
+        cache=media != "url"
+    )
+
+@app.post("/image-detect/batch")
+async def image_detection_batch(files: List[UploadFile] = File(...)):
+    """
+    Detect AI-generated images for several uploads in one batched forward pass.
+    Results come back in input order, with per-item errors.
+    """
+    if len(files) > IMAGE_BATCH_MAX_FILES:
+        return JSONResponse(status_code=413, content={"error": f"At most {IMAGE_BATCH_MAX_FILES} files per batch"})
+
+    image_model = await lifecycle.get("image")
+    items = []
+    for file in files:
+        try:
+            items.append(await read_upload(file, MAX_IMAGE_UPLOAD_BYTES))
+        except UploadTooLargeError as e:
+            items.append(e)
+
+    keys = [
+        None if isinstance(item, Exception) else content_key("image-batch", item, image_model.MODEL_VERSION)
+        for item in items
+    ]
+    results = [None if key is None else result_cache.get(key) for key in keys]
+
+    # Only images missing from the cache go to the model
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        scored = await executor.run("image", image_model.predict_images, [items[i] for i in misses])
+        for i, result in zip(misses, scored):
+            results[i] = result
+            if keys[i] is not None and "error" not in result:
+                result_cache.put(keys[i], result)
+
+    for file, result in zip(files, results):
+        result["filename"] = file.filename
+    return {"results": results}
+
+# ----------- ARTIFACTS -----------
+@app.get("/artifacts/{name}")
+async def artifact(name: str):
+    """
+    Serve a short-lived thumbnail, annotated image or heatmap produced with media=url.
+    """
+    path = artifact_store.path(name)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired artifact"})
+    return FileResponse(path, media_type=artifact_store.media_type(name))
+
+# ----------- SERVICE STATS & PROBES -----------
+def feature_cache_stats():
+    """Feature cache figures of this process and every inference worker that reported them"""
+    caches = list(executor.worker_feature_caches.values())
+    video_model = lifecycle.loaded("video")
+    if video_model is not None:
+        caches.append(video_model.feature_cache.stats())
+    return combine_cache_stats(caches) if caches else None
+
+@app.get("/stats")
+async def stats():
+    """
+    Report inference queue depths, limits, text batching statistics, model loading and memory.
+    """
+    return {
+        "executor": executor.stats(),
+        "text_batcher": text_batcher.stats(),
+        "lifecycle": lifecycle.stats(),
+        "result_cache": result_cache.stats(),
+        "video_jobs": video_jobs.stats(),
+        "feature_cache": feature_cache_stats(),
+        "models": model_memory_report()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: request and stage latency histograms, queue depths,
+    text batch sizes, cache hit rates and model memory.
+    """
+    lines = request_seconds.render() + stage_seconds.render()
+
+    modalities = executor.stats()["modalities"]
+    lines += render_metric(
+        "aidetect_queue_waiting", "gauge", "Requests waiting for an inference slot",
+        [({"modality": name}, limiter["waiting"]) for name, limiter in modalities.items()]
+    )
+    lines += render_metric(
+        "aidetect_queue_running", "gauge", "Inferences running",
+        [({"modality": name}, limiter["running"]) for name, limiter in modalities.items()]
+    )
+    lines += render_metric(
+        "aidetect_queue_rejected_total", "counter", "Requests rejected with HTTP 503 because the queue was full",
+        [({"modality": name}, limiter["rejected"]) for name, limiter in modalities.items()]
+    )
+    jobs = video_jobs.stats()
+    lines += render_metric(
+        "aidetect_video_jobs", "gauge", "Background video jobs by status",
+        [({"status": status}, jobs[status]) for status in ("queued", "running", "finished")]
+    )
+
+    # Batch size histogram of the text micro-batcher (its buckets are not cumulative)
+    batcher = text_batcher.stats()
+    lines += ["# HELP aidetect_text_batch_size Texts per model call", "# TYPE aidetect_text_batch_size histogram"]
+    cumulative = 0
+    for bucket, count in text_batcher.batch_size_counts.items():
+        cumulative += count
+        le = "+Inf" if bucket == float("inf") else f"{bucket:g}"
+        lines.append(f'aidetect_text_batch_size_bucket{{le="{le}"}} {cumulative}')
+    lines += [f"aidetect_text_batch_size_sum {batcher['items']}", f"aidetect_text_batch_size_count {batcher['batches']}"]
+
+    caches = {"result": result_cache.stats()}
+    feature_cache = feature_cache_stats()
+    if feature_cache is not None:
+        caches["feature"] = feature_cache
+    lines += render_metric(
+        "aidetect_cache_hits_total", "counter", "Cache hits",
+        [({"cache": name}, cache["hits"]) for name, cache in caches.items()]
+    )
+    lines += render_metric(
+        "aidetect_cache_misses_total", "counter", "Cache misses",
+        [({"cache": name}, cache["misses"]) for name, cache in caches.items()]
+    )
+    lines += render_metric(
+        "aidetect_cache_hit_ratio", "gauge", "Share of cache lookups that hit",
+        [({"cache": name}, cache["hit_rate"]) for name, cache in caches.items()]
+    )
+
+    models = model_memory_report()
+    lines += render_metric(
+        "aidetect_model_memory_bytes", "gauge", "Weights held by each loaded model",
+        [({"model": name}, memory["bytes"]) for name, memory in models.items()]
+    )
+    lines += render_metric(
+        "aidetect_modality_ready", "gauge", "1 once a modality's model has loaded",
+        [({"modality": name}, state["status"] == "ready") for name, state in lifecycle.stats()["modalities"].items()]
+    )
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 once every enabled modality has finished loading.
     """
-    return await predict_image(file)
+    status_code = 200 if lifecycle.is_ready() else 503
+    return JSONResponse(status_code=status_code, content=lifecycle.stats())
 
 # Serve frontend pages
 @app.get("/", response_class=HTMLResponse)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+
+TEXT_BATCH_MAX_SIZE = int(os.environ.get("TEXT_BATCH_MAX_SIZE", "32"))
+TEXT_BATCH_MAX_WAIT_MS = float(os.environ.get("TEXT_BATCH_MAX_WAIT_MS", "5"))
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, float("inf"))
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into batched calls.
+
+    Items are collected until max_batch_size are pending or the oldest has
+    waited max_wait_ms, then `batch_fn(items)` (an async callable returning
+    one result per item, in order) runs once and results fan back out to
+    each caller.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=TEXT_BATCH_MAX_SIZE, max_wait_ms=TEXT_BATCH_MAX_WAIT_MS):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+        self.batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.total_wait = 0.0
+        self.max_seen_wait = 0.0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        now = time.perf_counter()
+        self._record(len(batch), [now - queued_at for _, _, queued_at in batch])
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = await self.batch_fn(items)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size, waits):
+        self.batches += 1
+        self.items += size
+        self.max_seen_batch = max(self.max_seen_batch, size)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_counts[bucket] += 1
+                break
+        self.total_wait += sum(waits)
+        self.max_seen_wait = max(self.max_seen_wait, max(waits))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_observed_batch_size": self.max_seen_batch,
+            "batch_size_histogram": {f"le_{bucket:g}": count for bucket, count in self.batch_size_counts.items()},
+            "mean_wait_ms": 1000.0 * self.total_wait / self.items if self.items else 0.0,
+            "max_wait_observed_ms": 1000.0 * self.max_seen_wait,
+        }
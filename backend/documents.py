@@ -0,0 +1,186 @@
+import heapq
+import os
+import re
+
+# Longest segment handed to the text model; longer runs without a boundary are cut at whitespace
+DOCUMENT_MAX_SEGMENT_CHARS = int(os.environ.get("DOCUMENT_MAX_SEGMENT_CHARS", "2000"))
+# Segments scored per model call in document mode
+DOCUMENT_BATCH_SIZE = int(os.environ.get("DOCUMENT_BATCH_SIZE", "32"))
+# Most AI-like segments named in the document verdict
+DOCUMENT_TOP_SEGMENTS = int(os.environ.get("DOCUMENT_TOP_SEGMENTS", "3"))
+
+# The "gap" group is the whitespace between two units; units end where it starts
+BOUNDARIES = {
+    "sentence": re.compile(r"[.!?]+[\"'”’)\]]*(?P<gap>\s+)"),
+    "paragraph": re.compile(r"(?P<gap>\r?\n[ \t]*\r?\n\s*)"),
+}
+# Characters a boundary match can start with or run through before its gap
+BOUNDARY_CHARS = ".!?\"'”’)] \t\r\n\f\v"
+SEPARATORS = {
+    "sentence": " ",
+    "paragraph": "\n\n",
+}
+
+
+class DocumentSegmenter:
+    """Splits text fed in arbitrary chunks into windows of `window` sentences or paragraphs.
+
+    Only the unfinished tail of the text and the current window are held, so
+    memory stays bounded by max_chars and window whatever the document length.
+    Units longer than max_chars are cut at whitespace, and the segments are
+    the same however the text is split into chunks. Segments are dicts with
+    their index and [start, end) character offsets.
+    """
+
+    def __init__(self, mode="paragraph", window=1, max_chars=DOCUMENT_MAX_SEGMENT_CHARS):
+        if mode not in BOUNDARIES:
+            raise ValueError(f"Unknown segment mode: {mode}")
+        self.boundary = BOUNDARIES[mode]
+        self.separator = SEPARATORS[mode]
+        self.window = window
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._offset = 0  # document offset of the start of _buffer
+        self._start = 0  # where in _buffer the unfinished unit starts
+        self._resume = 0  # where in _buffer the next boundary search starts
+        self._units = []
+        self._chars = 0  # length of the current window's joined text
+        self._count = 0
+
+    def feed(self, chunk):
+        """Add text and return the segments it completed"""
+        self._buffer += chunk
+        segments = []
+        position = self._start
+        resume = None
+        for match in self.boundary.finditer(self._buffer, self._resume):
+            if match.end("gap") <= position:
+                # Seen in an earlier call
+                continue
+            end = match.start("gap")
+            position = self._cut(position, end, segments)
+            # Whitespace at the very end may continue in the next chunk
+            if match.end("gap") == len(self._buffer):
+                resume = match.start()
+                break
+            self._add_unit(position, end, segments)
+            position = match.end("gap")
+        else:
+            # The unfinished unit ends at its last non-whitespace character or later
+            position = self._cut(position, len(self._buffer.rstrip()), segments)
+
+        # Boundary characters just before the unit start are kept: a match can begin there
+        keep = len(self._buffer[:position].rstrip(BOUNDARY_CHARS))
+        self._buffer = self._buffer[keep:]
+        self._offset += keep
+        self._start = position - keep
+        if resume is None:
+            # Scanned text holds no other boundary; one can only start in the trailing run
+            resume = len(self._buffer.rstrip(BOUNDARY_CHARS))
+        else:
+            resume -= keep
+        self._resume = max(0, resume)
+        return segments
+
+    def close(self):
+        """Return the segments left once the whole document has been fed"""
+        segments = []
+        end = len(self._buffer.rstrip())
+        self._add_unit(self._cut(self._start, end, segments), end, segments)
+        self._offset += len(self._buffer)
+        self._buffer = ""
+        self._start = 0
+        if self._units:
+            segments.append(self._flush())
+        return segments
+
+    def _cut(self, position, end, segments):
+        """Add max_chars pieces of the unit [position, end), cut at the last whitespace that fits.
+
+        Returns where the rest of the unit, at most max_chars long, starts.
+        """
+        while end - position > self.max_chars:
+            limit = position + self.max_chars
+            cut = max(self._buffer.rfind(c, position, limit) for c in " \n\r\t")
+            if cut <= position:
+                cut = limit
+            self._add_unit(position, cut, segments)
+            position = cut
+        return position
+
+    def _add_unit(self, start, end, segments):
+        text = self._buffer[start:end]
+        stripped = text.strip()
+        if not stripped:
+            return
+        start = self._offset + start + (len(text) - len(text.lstrip()))
+        # Windows never grow past max_chars, even when short of `window` units
+        if self._units and self._chars + len(self.separator) + len(stripped) > self.max_chars:
+            segments.append(self._flush())
+        self._units.append((start, start + len(stripped), stripped))
+        self._chars += len(stripped) + (len(self.separator) if len(self._units) > 1 else 0)
+        if len(self._units) >= self.window:
+            segments.append(self._flush())
+
+    def _flush(self):
+        segment = {
+            "index": self._count,
+            "start": self._units[0][0],
+            "end": self._units[-1][1],
+            "text": self.separator.join(unit[2] for unit in self._units),
+        }
+        self._units = []
+        self._chars = 0
+        self._count += 1
+        return segment
+
+
+class DocumentVerdict:
+    """Running aggregate of segment scores; constant memory however many segments arrive.
+
+    The document score is the mean segment score weighted by segment length,
+    so a few short AI-like sentences don't outweigh pages of human text.
+    """
+
+    def __init__(self, top=DOCUMENT_TOP_SEGMENTS):
+        self.top = top
+        self.segments = 0
+        self.chars = 0
+        self.weighted_score = 0.0
+        self.ai_segments = 0
+        self.ai_chars = 0
+        self.max_score = None
+        self._top = []  # min-heap of (score, index, start, end)
+
+    def add(self, segment, score):
+        chars = len(segment["text"])
+        self.segments += 1
+        self.chars += chars
+        self.weighted_score += score * chars
+        if score > 0.5:
+            self.ai_segments += 1
+            self.ai_chars += chars
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        entry = (score, segment["index"], segment["start"], segment["end"])
+        if len(self._top) < self.top:
+            heapq.heappush(self._top, entry)
+        elif entry > self._top[0]:
+            heapq.heapreplace(self._top, entry)
+
+    @property
+    def score(self):
+        return self.weighted_score / self.chars if self.chars else None
+
+    def summary(self):
+        return {
+            "segments": self.segments,
+            "chars": self.chars,
+            "score": None if self.score is None else round(self.score, 4),
+            "max_score": None if self.max_score is None else round(self.max_score, 4),
+            "ai_segments": self.ai_segments,
+            "ai_fraction": round(self.ai_chars / self.chars, 4) if self.chars else 0.0,
+            "most_ai_like": [
+                {"index": index, "start": start, "end": end, "score": round(score, 4)}
+                for score, index, start, end in sorted(self._top, reverse=True)
+            ],
+        }
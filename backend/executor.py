@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from backend.metrics import observe_stage, span
+from backend.workers import SharedModelPool, available_cores, call_in_worker
+
+# "thread" shares the loaded models; "process" sidesteps the GIL for OpenCV/NumPy work with
+# spawned workers that each import (and load) the models they're asked to run; "shared" forks
+# workers that share one copy of the weights. Every modality gets its own pool, sized to its
+# concurrency, so a slow video never queues text behind it inside a pool.
+EXECUTOR_KIND = os.environ.get("INFERENCE_EXECUTOR", "thread")
+
+# Modalities served by the forked workers in "shared" mode. Text stays on threads in the
+# front process: TensorFlow isn't fork-safe and releases the GIL in its own kernels.
+SHARED_MODALITIES = ("image", "video")
+
+# Forked workers (and so concurrent inferences) per shared modality in "shared" mode
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", str(max(1, available_cores() // len(SHARED_MODALITIES)))))
+# Torch threads per "shared" worker; 0 splits the available cores between all the workers
+INFERENCE_WORKER_THREADS = int(os.environ.get("INFERENCE_WORKER_THREADS", "0"))
+
+# Per-modality (concurrency, max queued requests), overridable via e.g. VIDEO_CONCURRENCY / VIDEO_MAX_QUEUE
+DEFAULT_LIMITS = {
+    "text": (4, 64),
+    "image": (2, 16),
+    "video": (1, 8),
+}
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a modality's queue is full and the request should be retried later"""
+
+    def __init__(self, modality, queue_depth, max_queue):
+        super().__init__(f"{modality} inference queue is full ({queue_depth}/{max_queue} waiting)")
+        self.modality = modality
+        self.queue_depth = queue_depth
+        self.max_queue = max_queue
+
+
+class ModalityLimiter:
+    """Caps running and waiting requests for one modality"""
+
+    def __init__(self, name, concurrency, max_queue):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+def limits_from_env(defaults=DEFAULT_LIMITS):
+    limits = {}
+    for modality, (concurrency, max_queue) in defaults.items():
+        prefix = modality.upper()
+        limits[modality] = (
+            int(os.environ.get(f"{prefix}_CONCURRENCY", str(concurrency))),
+            int(os.environ.get(f"{prefix}_MAX_QUEUE", str(max_queue))),
+        )
+    return limits
+
+
+class InferenceExecutor:
+    """Runs blocking inference off the event loop with per-modality limits"""
+
+    def __init__(self, kind=EXECUTOR_KIND, max_workers=INFERENCE_WORKERS, limits=None):
+        if kind not in ("thread", "process", "shared"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        if limits is None:
+            defaults = dict(DEFAULT_LIMITS)
+            if kind == "shared":
+                # One forked worker per slot, at least max_workers for each shared modality
+                for modality in SHARED_MODALITIES:
+                    concurrency, max_queue = defaults[modality]
+                    defaults[modality] = (max(concurrency, max_workers), max_queue)
+            limits = limits_from_env(defaults)
+        self.limiters = {
+            modality: ModalityLimiter(modality, concurrency, max_queue)
+            for modality, (concurrency, max_queue) in limits.items()
+        }
+        self._pools = {}
+        # Latest feature cache stats reported by each worker process, by pid
+        self.worker_feature_caches = {}
+        self.shared = {}
+        if kind == "shared":
+            workers = sum(self.limiters[modality].concurrency for modality in SHARED_MODALITIES)
+            threads = INFERENCE_WORKER_THREADS or max(1, available_cores() // workers)
+            self.shared = {
+                modality: SharedModelPool(self.limiters[modality].concurrency, threads)
+                for modality in SHARED_MODALITIES
+            }
+
+    async def start(self, load=None):
+        """In "shared" mode, load the shared modalities' models via load() and fork the workers"""
+        if self.shared:
+            if load is not None:
+                await asyncio.get_running_loop().run_in_executor(None, load)
+            # Fork from the event loop thread, the one thread the workers should inherit
+            for pool in self.shared.values():
+                pool.start()
+
+    def pool(self, modality):
+        """The modality's own pool, with one worker per concurrency slot"""
+        if modality in self.shared:
+            return self.shared[modality].pool
+        pool = self._pools.get(modality)
+        if pool is None:
+            workers = self.limiters[modality].concurrency
+            if self.kind == "process":
+                # Spawned, not forked: by the first request the parent has loaded TensorFlow
+                # and torch and runs their thread pools, which don't survive a fork
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"inference-{modality}")
+            self._pools[modality] = pool
+        return pool
+
+    @asynccontextmanager
+    async def slot(self, modality, reject=True):
+        """Hold one of `modality`'s concurrency slots, waiting for it if needed.
+
+        With reject=True a full queue raises ExecutorSaturatedError instead of
+        waiting; callers with their own bounded queue (video jobs) pass False.
+        """
+        limiter = self.limiters[modality]
+        if reject and limiter.waiting >= limiter.max_queue:
+            limiter.rejected += 1
+            raise ExecutorSaturatedError(modality, limiter.waiting, limiter.max_queue)
+
+        limiter.waiting += 1
+        try:
+            with span(f"{modality}_queue"):
+                await limiter.semaphore.acquire()
+        finally:
+            limiter.waiting -= 1
+
+        limiter.running += 1
+        try:
+            yield
+        finally:
+            limiter.running -= 1
+            limiter.semaphore.release()
+
+    def runs_in_threads(self, modality):
+        """Whether `modality` runs on threads of this process (else in worker processes)"""
+        return self.kind == "thread" or (self.kind == "shared" and modality not in self.shared)
+
+    async def call(self, modality, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the modality's pool; the caller holds its slot"""
+        pool = self.pool(modality)
+        if isinstance(pool, ThreadPoolExecutor):
+            # Keep contextvars (e.g. request-scoped state) visible in the worker thread
+            call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+        call = functools.partial(call_in_worker, fn, *args, **kwargs)
+        result, spans, pid, feature_cache = await asyncio.get_running_loop().run_in_executor(pool, call)
+        # Spans timed in the worker count toward this process's metrics and profile
+        for stage, elapsed in spans:
+            observe_stage(stage, elapsed)
+        if feature_cache is not None:
+            self.worker_feature_caches[pid] = feature_cache
+        return result
+
+    async def run(self, modality, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool once a slot for `modality` is free"""
+        async with self.slot(modality):
+            return await self.call(modality, fn, *args, **kwargs)
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "shared_workers": {name: pool.stats() for name, pool in self.shared.items()} or None,
+            "modalities": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+    def shutdown(self):
+        for pool in self.shared.values():
+            pool.shutdown()
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools = {}
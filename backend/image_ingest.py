@@ -0,0 +1,163 @@
+import os
+import struct
+
+# Largest image accepted, in pixels, checked against the header before decoding. Only JPEGs
+# are decoded at reduced resolution, so it applies to them; other formats decode at full
+# size (3 bytes per pixel) and are held to the lower MAX_FULL_DECODE_PIXELS.
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", str(100_000_000)))
+MAX_FULL_DECODE_PIXELS = int(os.environ.get("MAX_FULL_DECODE_PIXELS", str(16_000_000)))
+
+# OpenCV reads its own decoder cap once, when cv2 is first imported; import this module first
+os.environ.setdefault("OPENCV_IO_MAX_IMAGE_PIXELS", str(max(MAX_IMAGE_PIXELS, MAX_FULL_DECODE_PIXELS)))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from backend.metrics import span  # noqa: E402
+from backend.uploads import MAX_IMAGE_UPLOAD_BYTES, UploadTooLargeError  # noqa: E402
+
+# Side length the deepfake model expects
+TARGET_SIZE = 224
+
+# Decode-time reductions, largest first (libjpeg scales JPEGs while decoding its DCT blocks)
+REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# JPEG start-of-frame markers (C4, C8 and CC are other segments)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image's dimensions exceed its format's pixel limit"""
+
+    def __init__(self, width, height, max_pixels):
+        super().__init__(f"Image of {width}x{height} pixels exceeds the {max_pixels} pixel limit")
+        self.max_pixels = max_pixels
+
+
+def _jpeg_size(contents):
+    i = 2
+    while i + 9 < len(contents):
+        if contents[i] != 0xFF:
+            return None
+        marker = contents[i + 1]
+        if marker == 0xFF:
+            # Fill byte before the marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            # Standalone markers carry no length
+            i += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", contents[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", contents[i + 2:i + 4])[0]
+    return None
+
+
+def _webp_size(contents):
+    chunk = contents[12:16]
+    if chunk == b"VP8 " and len(contents) >= 30:
+        width, height = struct.unpack("<HH", contents[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(contents) >= 25:
+        bits = int.from_bytes(contents[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(contents) >= 30:
+        return int.from_bytes(contents[24:27], "little") + 1, int.from_bytes(contents[27:30], "little") + 1
+    return None
+
+
+def _tiff_size(contents):
+    order = "<" if contents[:2] == b"II" else ">"
+    (offset,) = struct.unpack(order + "I", contents[4:8])
+    (entries,) = struct.unpack(order + "H", contents[offset:offset + 2])
+    size = {}
+    for i in range(entries):
+        entry = offset + 2 + 12 * i
+        tag, kind = struct.unpack(order + "HH", contents[entry:entry + 4])
+        if tag in (256, 257):
+            # ImageWidth / ImageLength, stored as SHORT (3) or LONG (4)
+            fmt = order + ("H" if kind == 3 else "I")
+            size[tag] = struct.unpack(fmt, contents[entry + 8:entry + 8 + struct.calcsize(fmt)])[0]
+    return (size[256], size[257]) if len(size) == 2 else None
+
+
+def image_size(contents):
+    """(width, height) read from a JPEG, PNG, GIF, BMP, WebP or TIFF header; None for other or truncated files"""
+    try:
+        if contents[:2] == b"\xff\xd8":
+            return _jpeg_size(contents)
+        if contents[:8] == b"\x89PNG\r\n\x1a\n" and contents[12:16] == b"IHDR":
+            return struct.unpack(">II", contents[16:24])
+        if contents[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", contents[6:10])
+        if contents[:2] == b"BM":
+            width, height = struct.unpack("<ii", contents[18:26])
+            # Top-down bitmaps store a negative height
+            return abs(width), abs(height)
+        if contents[:4] == b"RIFF" and contents[8:12] == b"WEBP":
+            return _webp_size(contents)
+        if contents[:4] in (b"II*\x00", b"MM\x00*"):
+            # Only the first page is decoded
+            return _tiff_size(contents)
+    except struct.error:
+        pass
+    return None
+
+
+def check_pixels(width, height, max_pixels):
+    if width * height > max_pixels:
+        raise ImageTooLargeError(width, height, max_pixels)
+
+
+def reduction(width, height, target=TARGET_SIZE):
+    """imdecode flag for the largest reduction that keeps both sides at or above target"""
+    for factor, flag in REDUCED_FLAGS:
+        if width // factor >= target and height // factor >= target:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(contents, target=TARGET_SIZE, max_bytes=None, max_pixels=None):
+    """Decode image bytes into a target x target BGR image.
+
+    The size and pixel limits are checked before anything is decoded, using
+    the dimensions in the file header; files whose header can't be read are
+    rejected. JPEGs are decoded close to the target size, so a 50-megapixel
+    photo costs about as much as a small one. Other formats are decoded at
+    full size and capped at MAX_FULL_DECODE_PIXELS (or max_pixels, if lower).
+    Raises ValueError for unreadable, unsupported or oversized images.
+    """
+    # Also checked here for callers that don't go through backend.uploads.read_upload
+    max_bytes = MAX_IMAGE_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if len(contents) > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+    size = image_size(contents)
+    if size is None:
+        # Without the dimensions there is no way to bound the decode
+        raise ValueError("Could not read image file: unsupported format or truncated header")
+    max_pixels = MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+    flag = cv2.IMREAD_COLOR
+    if contents[:2] == b"\xff\xd8":
+        flag = reduction(*size, target)
+    else:
+        max_pixels = min(max_pixels, MAX_FULL_DECODE_PIXELS)
+    check_pixels(*size, max_pixels)
+
+    with span("decode"):
+        try:
+            img = cv2.imdecode(np.frombuffer(contents, np.uint8), flag)
+        except cv2.error:
+            # OpenCV's own OPENCV_IO_MAX_IMAGE_PIXELS check, e.g. a header that lied
+            img = None
+    if img is None:
+        raise ValueError("Could not read image file")
+
+    # INTER_AREA averages the remaining reduction instead of skipping pixels
+    return cv2.resize(img, (target, target), interpolation=cv2.INTER_AREA)
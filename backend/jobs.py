@@ -0,0 +1,244 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+
+from backend.executor import ExecutorSaturatedError, InferenceExecutor
+
+# Videos analysed at once by background jobs, and jobs allowed to wait
+VIDEO_JOB_WORKERS = int(os.environ.get("VIDEO_JOB_WORKERS", "1"))
+VIDEO_JOB_MAX_QUEUE = int(os.environ.get("VIDEO_JOB_MAX_QUEUE", "16"))
+# Uploaded videos wait here and finished results are written here as JSON
+VIDEO_JOB_DIR = os.environ.get("VIDEO_JOB_DIR", os.path.join(tempfile.gettempdir(), "aidetect-jobs"))
+# Finished jobs are forgotten (in memory and on disk) after this long
+VIDEO_JOB_TTL_SECONDS = float(os.environ.get("VIDEO_JOB_TTL_SECONDS", "3600"))
+
+
+class Job:
+    """One queued video analysis and the progress events it has produced"""
+
+    def __init__(self, job_id, fn, video_path, options):
+        self.id = job_id
+        self.fn = fn
+        self.video_path = video_path
+        self.options = options
+        self.status = "queued"
+        self.events = [("status", {"status": "queued"})]
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    async def publish(self, event, data):
+        async with self._changed:
+            self.events.append((event, data))
+            self._changed.notify_all()
+
+    async def follow(self):
+        """Yield every event so far, then new ones as they arrive, until the job finishes"""
+        position = 0
+        while True:
+            async with self._changed:
+                while position >= len(self.events) and not self.done:
+                    await self._changed.wait()
+                pending = self.events[position:]
+                finished = self.done
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and position >= len(self.events):
+                return
+
+    def summary(self):
+        summary = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.done:
+            summary["result"] = self.result
+        return summary
+
+
+class QueueProgress:
+    """Picklable progress callback that sends events back from a worker process over a queue"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __call__(self, event, data):
+        self.queue.put((event, data))
+
+
+class JobManager:
+    """In-process video job queue with bounded workers and a local-file result store.
+
+    Jobs run through the InferenceExecutor's "video" pool and hold one of its
+    slots while they run, so jobs and /video-detect requests share the same
+    workers and concurrency bound. Without an executor, jobs get a thread pool
+    of their own.
+    """
+
+    def __init__(self, workers=VIDEO_JOB_WORKERS, max_queue=VIDEO_JOB_MAX_QUEUE,
+                 job_dir=VIDEO_JOB_DIR, ttl=VIDEO_JOB_TTL_SECONDS, executor=None):
+        self.executor = executor or InferenceExecutor(kind="thread", limits={"video": (workers, max_queue)})
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_dir = job_dir
+        self.ttl = ttl
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+        # Carries progress events back from worker processes
+        self._manager = None
+
+    def start(self):
+        os.makedirs(self.job_dir, exist_ok=True)
+        # Drop results and orphaned uploads left by earlier runs once they are stale
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if not self.executor.runs_in_threads("video"):
+            # Spawned rather than forked from a process running torch threads
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def new_video_path(self):
+        """Where an upload for a new job should be saved; the job removes it when done"""
+        return os.path.join(self.job_dir, f"{uuid.uuid4().hex}.upload")
+
+    def check_capacity(self):
+        """Raise ExecutorSaturatedError when the queue is full, e.g. before saving an upload"""
+        if self._queue.full():
+            raise ExecutorSaturatedError("video-jobs", self._queue.qsize(), self.max_queue)
+
+    def submit(self, fn, video_path, **options):
+        """Queue fn(video_path, progress=..., **options); raises when the queue is full"""
+        self._expire()
+        self.check_capacity()
+        job = Job(uuid.uuid4().hex, fn, video_path, options)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ExecutorSaturatedError("video-jobs", self._queue.qsize(), self.max_queue)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        """A live job, or the summary of a finished one stored on disk, or None"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.summary()
+        path = self._result_path(job_id)
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return None
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job, loop)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job, loop):
+        def progress(event, data):
+            # Called from the worker thread; hand the event to the event loop
+            asyncio.run_coroutine_threadsafe(job.publish(event, data), loop)
+
+        events = drain = None
+        if self._manager is not None:
+            events = self._manager.Queue()
+            progress = QueueProgress(events)
+            drain = asyncio.ensure_future(self._drain(job, events, loop))
+
+        try:
+            # Jobs have their own bounded queue, so they wait for a slot rather than fail
+            async with self.executor.slot("video", reject=False):
+                job.status = "running"
+                await job.publish("status", {"status": "running"})
+                result = await self.executor.call("video", job.fn, job.video_path, progress=progress, **job.options)
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            try:
+                os.remove(job.video_path)
+            except FileNotFoundError:
+                pass
+
+        # Let progress events still in flight land before the final one
+        if drain is not None:
+            events.put(None)
+            await drain
+        await asyncio.sleep(0)
+        job.result = result
+        job.finished_at = time.time()
+        async with job._changed:
+            job.status = "failed" if "error" in result else "done"
+            job.events.append((job.status, result))
+            job._changed.notify_all()
+        self._store(job)
+
+    async def _drain(self, job, events, loop):
+        """Publish progress events from a worker process until the None sentinel"""
+        while True:
+            item = await loop.run_in_executor(None, events.get)
+            if item is None:
+                return
+            await job.publish(*item)
+
+    def _result_path(self, job_id):
+        # Job ids are uuid4 hex; anything else never maps to a file
+        if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _store(self, job):
+        path = self._result_path(job.id)
+        with open(path + ".tmp", "w") as f:
+            json.dump(job.summary(), f)
+        os.replace(path + ".tmp", path)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+            try:
+                os.remove(self._result_path(job_id))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        statuses = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "finished": statuses.count("done") + statuses.count("failed"),
+        }
@@ -0,0 +1,138 @@
+import asyncio
+import importlib
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Modality -> module holding its heavy imports and model weights
+MODALITY_MODULES = {
+    "text": "backend.model_defs.text_model",
+    "image": "backend.model_defs.image_model",
+    "video": "backend.model_defs.video_model",
+}
+
+# Comma-separated subset of MODALITY_MODULES served by this deployment
+ENABLED_MODALITIES = [
+    name.strip()
+    for name in os.environ.get("ENABLED_MODALITIES", ",".join(MODALITY_MODULES)).split(",")
+    if name.strip()
+]
+
+# "background" warms every enabled modality at startup; "lazy" loads on first request
+MODEL_LOADING = os.environ.get("MODEL_LOADING", "background")
+
+
+class ModalityUnavailableError(RuntimeError):
+    """Raised when a modality is disabled or failed to load"""
+
+    def __init__(self, modality, reason):
+        super().__init__(f"{modality} detection is unavailable: {reason}")
+        self.modality = modality
+        self.reason = reason
+
+
+class ModalityState:
+    def __init__(self, name, enabled):
+        self.name = name
+        self.status = "pending" if enabled else "disabled"
+        self.module = None
+        self.error = None
+        self.load_seconds = None
+        self.lock = threading.Lock()
+
+    def stats(self):
+        stats = {"status": self.status}
+        if self.load_seconds is not None:
+            stats["load_seconds"] = round(self.load_seconds, 2)
+        if self.error is not None:
+            stats["error"] = self.error
+        return stats
+
+
+class LifecycleManager:
+    """Imports each modality's model module on first use or in a background warm-up"""
+
+    def __init__(self, enabled=None, mode=MODEL_LOADING):
+        enabled = ENABLED_MODALITIES if enabled is None else enabled
+        unknown = set(enabled) - set(MODALITY_MODULES)
+        if unknown:
+            raise ValueError(f"Unknown modalities: {', '.join(sorted(unknown))}")
+        if mode not in ("background", "lazy"):
+            raise ValueError(f"Unknown model loading mode: {mode}")
+        self.mode = mode
+        self.modalities = {name: ModalityState(name, name in enabled) for name in MODALITY_MODULES}
+        self._warmup_task = None
+
+    def load(self, modality):
+        """Import the modality's module (loading its weights) once; blocking"""
+        state = self.modalities[modality]
+        if state.status == "disabled":
+            raise ModalityUnavailableError(modality, "disabled in this deployment")
+
+        with state.lock:
+            if state.status == "failed":
+                raise ModalityUnavailableError(modality, state.error)
+            if state.module is None:
+                state.status = "loading"
+                started = time.perf_counter()
+                try:
+                    state.module = importlib.import_module(MODALITY_MODULES[modality])
+                except Exception as e:
+                    traceback.print_exc()
+                    state.status = "failed"
+                    state.error = f"{type(e).__name__}: {e}"
+                    raise ModalityUnavailableError(modality, state.error)
+                state.load_seconds = time.perf_counter() - started
+                state.status = "ready"
+        return state.module
+
+    def loaded(self, modality):
+        """The modality's module if it has already loaded, else None"""
+        return self.modalities[modality].module
+
+    async def get(self, modality):
+        """Return the modality's module, loading it off the event loop if needed"""
+        state = self.modalities[modality]
+        if state.module is not None:
+            return state.module
+        return await asyncio.get_running_loop().run_in_executor(None, self.load, modality)
+
+    async def warm_up(self):
+        for name, state in self.modalities.items():
+            if state.status == "pending":
+                try:
+                    await self.get(name)
+                except ModalityUnavailableError:
+                    # Recorded on the state; the other modalities keep loading
+                    pass
+
+    def start(self):
+        if self.mode == "background":
+            self._warmup_task = asyncio.ensure_future(self.warm_up())
+
+    def stop(self):
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            self._warmup_task = None
+
+    def is_ready(self):
+        """Ready once every enabled modality has loaded (lazy mode only needs no failures)"""
+        statuses = [state.status for state in self.modalities.values() if state.status != "disabled"]
+        if self.mode == "lazy":
+            return "failed" not in statuses
+        return all(status == "ready" for status in statuses)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "ready": self.is_ready(),
+            "modalities": {name: state.stats() for name, state in self.modalities.items()},
+        }
+
+
+def model_memory_report():
+    """Model memory figures, without importing torch if no model is loaded yet"""
+    registry = sys.modules.get("backend.model_defs.registry")
+    return registry.memory_report() if registry is not None else {}
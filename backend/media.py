@@ -0,0 +1,107 @@
+import base64
+import os
+import re
+import tempfile
+import time
+import uuid
+
+import cv2
+
+from backend.metrics import span
+
+# Default encoding of thumbnails, annotated images and heatmaps in responses
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "jpeg")
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "75"))
+# Short-lived artifacts served at /artifacts/{name} when media=url is requested
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "aidetect-artifacts"))
+ARTIFACT_TTL_SECONDS = float(os.environ.get("ARTIFACT_TTL_SECONDS", "600"))
+
+# How images are returned: embedded data URIs, artifact URLs, or left out
+MEDIA_MODES = ("inline", "url", "none")
+
+FORMATS = {
+    # format: (file extension, MIME type, OpenCV quality flag)
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def encode_image(img_bgr, image_format=None, quality=None):
+    """Encode a BGR uint8 image straight from OpenCV, without PIL copies"""
+    extension, _, quality_flag = FORMATS[image_format or IMAGE_FORMAT]
+    with span("encode"):
+        ok, buffer = cv2.imencode(extension, img_bgr, [quality_flag, quality or IMAGE_QUALITY])
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format or IMAGE_FORMAT}")
+    return buffer.tobytes()
+
+
+class ArtifactStore:
+    """Directory of encoded images that expire after a TTL; safe to share across processes"""
+
+    NAME_PATTERN = re.compile(r"^[0-9a-f]{32}\.(jpg|webp)$")
+
+    def __init__(self, directory=ARTIFACT_DIR, ttl=ARTIFACT_TTL_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+        self._last_sweep = 0.0
+
+    def put(self, data, image_format):
+        """Store encoded bytes and return the artifact's name"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._sweep()
+        name = uuid.uuid4().hex + FORMATS[image_format][0]
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        return name
+
+    def path(self, name):
+        """Filesystem path of a live artifact, or None if unknown or expired"""
+        if not self.NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl:
+                os.remove(path)
+                return None
+        except OSError:
+            return None
+        return path
+
+    def media_type(self, name):
+        extension = os.path.splitext(name)[1]
+        return next(mime for ext, mime, _ in FORMATS.values() if ext == extension)
+
+    def _sweep(self):
+        # Remove expired artifacts at most once a minute
+        now = time.time()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < now - self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+artifact_store = ArtifactStore()
+
+
+def render_image(img_bgr, media="inline", image_format=None, quality=None):
+    """Encode a BGR image for a response according to the media mode.
+
+    Returns a data URI ("inline"), an /artifacts/ URL ("url") or None ("none").
+    """
+    if media == "none":
+        return None
+    image_format = image_format or IMAGE_FORMAT
+    data = encode_image(img_bgr, image_format, quality)
+    if media == "url":
+        return f"/artifacts/{artifact_store.put(data, image_format)}"
+    mime = FORMATS[image_format][1]
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
@@ -0,0 +1,140 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+# Requests sending this header get their stage breakdown back in a Server-Timing header
+PROFILE_HEADER = os.environ.get("PROFILE_HEADER", "X-Profile")
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class Histogram:
+    """Thread-safe labelled histogram with fixed buckets, rendered in Prometheus text format"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            base = dict(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{format_labels(dict(base, le=le))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(base)} {total:.6f}")
+            lines.append(f"{self.name}_count{format_labels(base)} {count}")
+        return lines
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def render_metric(name, kind, help_text, samples):
+    """Prometheus text for a gauge or counter; samples are (labels dict, value) pairs"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        value = float(value)
+        lines.append(f"{name}{format_labels(labels)} {int(value) if value.is_integer() else value}")
+    return lines
+
+
+request_seconds = Histogram(
+    "aidetect_request_duration_seconds",
+    "Time from request to response headers, by route",
+    ("method", "route", "status"),
+)
+stage_seconds = Histogram(
+    "aidetect_stage_duration_seconds",
+    "Time spent in each hot-path stage (upload, decode, inference, encoding...)",
+    ("stage",),
+)
+
+# Stage totals of the current request when it asked to be profiled, else None.
+# Executor threads run in a copy of the request's context, so they add to the same dict.
+_profile = contextvars.ContextVar("profile", default=None)
+_profile_lock = threading.Lock()
+# (stage, seconds) of every span in a call running in a worker process, to be sent back
+_recorded = contextvars.ContextVar("recorded", default=None)
+
+
+def observe_stage(stage, elapsed):
+    """Add a stage duration to the histogram and, if profiling, the request's breakdown"""
+    stage_seconds.observe((stage,), elapsed)
+    profile = _profile.get()
+    if profile is not None:
+        with _profile_lock:
+            total, count = profile.get(stage, (0.0, 0))
+            profile[stage] = (total + elapsed, count + 1)
+
+
+@contextmanager
+def span(stage):
+    """Time a block into the stage histogram and, if profiling, the request's breakdown"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe_stage(stage, elapsed)
+        recorded = _recorded.get()
+        if recorded is not None:
+            recorded.append((stage, elapsed))
+
+
+@contextmanager
+def recording_spans():
+    """Collect the spans timed inside the block, for replaying in another process"""
+    recorded = []
+    token = _recorded.set(recorded)
+    try:
+        yield recorded
+    finally:
+        _recorded.reset(token)
+
+
+def start_profile():
+    """Begin collecting a stage breakdown for the current request; returns the dict filled in"""
+    profile = {}
+    _profile.set(profile)
+    return profile
+
+
+def server_timing(profile, total=None):
+    """Format a stage breakdown as a Server-Timing header value (durations in ms)"""
+    with _profile_lock:
+        stages = sorted(profile.items(), key=lambda item: -item[1][0])
+    entries = [f'{stage};dur={seconds * 1000:.2f};desc="x{count}"' for stage, (seconds, count) in stages]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
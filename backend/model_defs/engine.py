@@ -0,0 +1,212 @@
+import argparse
+import copy
+import io
+import json
+import os
+import time
+import traceback
+
+import torch
+import torch.nn as nn
+
+# How the CNN backbone runs: "eager", "torchscript" (traced and frozen) or "compile" (torch.compile)
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "eager")
+# "dynamic" stores the LSTM and classifier weights as int8; "none" keeps float32
+INFERENCE_QUANTIZE = os.environ.get("INFERENCE_QUANTIZE", "none")
+# Run the backbone convolutions on NHWC tensors, which oneDNN handles faster on most CPUs
+INFERENCE_CHANNELS_LAST = os.environ.get("INFERENCE_CHANNELS_LAST", "false").lower() in ("1", "true", "yes")
+# Intra-op threads used by torch; 0 keeps torch's default (one per physical core)
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+# Compare an optimized model against the eager one at load and fall back to eager when
+# any score differs by more than ENGINE_PARITY_TOLERANCE or a label flips
+ENGINE_PARITY_CHECK = os.environ.get("ENGINE_PARITY_CHECK", "true").lower() in ("1", "true", "yes")
+ENGINE_PARITY_TOLERANCE = float(os.environ.get("ENGINE_PARITY_TOLERANCE", "0.02"))
+ENGINE_PARITY_SAMPLES = int(os.environ.get("ENGINE_PARITY_SAMPLES", "8"))
+# Optional directory of real sample images (e.g. extracted video frames) for the parity check
+ENGINE_PARITY_FRAMES_DIR = os.environ.get("ENGINE_PARITY_FRAMES_DIR", "")
+
+ENGINES = ("eager", "torchscript", "compile")
+QUANTIZATIONS = ("none", "dynamic")
+
+
+class ChannelsLast(nn.Module):
+    """Feeds a module NHWC input and hands back a contiguous NCHW result"""
+
+    def __init__(self, module):
+        super().__init__()
+        self.module = module.to(memory_format=torch.channels_last)
+
+    def forward(self, x):
+        return self.module(x.contiguous(memory_format=torch.channels_last)).contiguous()
+
+
+def serialized_bytes(model):
+    """Size of the model's weights as saved, which also counts packed int8 weights"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def sample_frames(frames_dir, num_samples, size=224):
+    """Up to num_samples images from frames_dir, preprocessed like video_model.to_tensor"""
+    import cv2
+
+    frames = []
+    for name in sorted(os.listdir(frames_dir)):
+        if len(frames) == num_samples:
+            break
+        img = cv2.imread(os.path.join(frames_dir, name), cv2.IMREAD_COLOR)
+        if img is None:
+            # Not an image
+            continue
+        img = cv2.cvtColor(cv2.resize(img, (size, size)), cv2.COLOR_BGR2RGB)
+        frames.append(torch.from_numpy(img).permute(2, 0, 1).float().div_(255.0))
+    return frames
+
+
+def parity_inputs(num_samples=ENGINE_PARITY_SAMPLES, size=224, seed=0, frames_dir=ENGINE_PARITY_FRAMES_DIR):
+    """Frames in [0, 1], the range the endpoints feed the model.
+
+    Real images from frames_dir come first; any remaining samples are
+    deterministic smooth noise at the model's input size.
+    """
+    frames = sample_frames(frames_dir, num_samples, size) if frames_dir else []
+    missing = num_samples - len(frames)
+    if missing > 0:
+        generator = torch.Generator().manual_seed(seed)
+        coarse = torch.rand((missing, 3, size // 16, size // 16), generator=generator)
+        noise = nn.functional.interpolate(coarse, size=(size, size), mode="bilinear", align_corners=False)
+        frames.extend(noise.clamp_(0, 1))
+    return torch.stack(frames)
+
+
+def parity_check(reference, candidate, frames=None, tolerance=ENGINE_PARITY_TOLERANCE):
+    """Compare per-frame and sequence scores of two models on the same frames"""
+    frames = parity_inputs() if frames is None else frames
+    with torch.no_grad():
+        expected_features = reference.extract_features(frames)
+        actual_features = candidate.extract_features(frames)
+        expected = torch.cat([
+            reference.classify_frames(expected_features),
+            reference.classify_sequence(expected_features).view(1),
+        ])
+        actual = torch.cat([
+            candidate.classify_frames(actual_features),
+            candidate.classify_sequence(actual_features).view(1),
+        ])
+    max_abs_diff = (expected - actual).abs().max().item()
+    label_agreement = ((expected > 0.5) == (actual > 0.5)).float().mean().item()
+    return {
+        "samples": frames.shape[0],
+        "max_abs_diff": max_abs_diff,
+        "label_agreement": label_agreement,
+        "passed": max_abs_diff <= tolerance and label_agreement == 1.0,
+    }
+
+
+def optimize(model, engine=INFERENCE_ENGINE, quantize=INFERENCE_QUANTIZE, channels_last=INFERENCE_CHANNELS_LAST):
+    """An optimized copy of an eval-mode DeepfakeDetectionModel; the original is left as is"""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine: {engine}")
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantize}")
+
+    parameters = sum(p.numel() for p in model.parameters())
+    model = copy.deepcopy(model)
+    if quantize == "dynamic":
+        # Only the recurrent and linear layers: their weights dominate and int8 GEMMs are cheap
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {"lstm", "classifier"}, dtype=torch.qint8, inplace=True
+        )
+    if channels_last:
+        model.cnn = ChannelsLast(model.cnn)
+    # Measured before tracing, since frozen graphs hold their weights as constants
+    size = serialized_bytes(model)
+
+    if engine == "torchscript":
+        example = torch.zeros((1, 3, 224, 224))
+        with torch.no_grad():
+            model.cnn = torch.jit.optimize_for_inference(torch.jit.trace(model.cnn, example))
+    elif engine == "compile":
+        model.cnn = torch.compile(model.cnn, dynamic=True)
+
+    model.eval()
+    model.engine_info = {"parameters": parameters, "bytes": size, "megabytes": round(size / (1024 * 1024), 1)}
+    return model
+
+
+def configure_threads(num_threads=TORCH_NUM_THREADS):
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+
+def prepare(model, engine=INFERENCE_ENGINE, quantize=INFERENCE_QUANTIZE, channels_last=INFERENCE_CHANNELS_LAST,
+            check=ENGINE_PARITY_CHECK):
+    """Apply the configured engine to a freshly loaded eager model.
+
+    Falls back to the eager model, with the reason recorded in engine_info,
+    when the optimized one fails to run or drifts from it on the parity check.
+    """
+    threads = configure_threads()
+    settings = {"engine": engine, "quantize": quantize, "channels_last": channels_last, "threads": threads}
+    if (engine, quantize, channels_last) == ("eager", "none", False):
+        model.engine_info = settings
+        return model
+
+    try:
+        optimized = optimize(model, engine, quantize, channels_last)
+        # Also warms up torch.compile / the frozen graph before the first request
+        parity = parity_check(model, optimized, frames=None if check else parity_inputs(1))
+    except Exception as e:
+        traceback.print_exc()
+        model.engine_info = dict(settings, engine="eager", quantize="none", channels_last=False,
+                                 fallback=f"{type(e).__name__}: {e}")
+        return model
+
+    if check and not parity["passed"]:
+        print(f"Inference engine {settings} failed the parity check ({parity}); using the eager model")
+        model.engine_info = dict(settings, engine="eager", quantize="none", channels_last=False,
+                                 fallback="parity check failed", parity=parity)
+        return model
+
+    optimized.engine_info.update(settings)
+    if check:
+        optimized.engine_info["parity"] = parity
+    return optimized
+
+
+def main():
+    """Report parity, latency and size of every engine combination for the deployed checkpoint"""
+    from backend.model_defs.registry import load_eager_deepfake_model
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--samples", type=int, default=ENGINE_PARITY_SAMPLES)
+    parser.add_argument("--frames-dir", default=ENGINE_PARITY_FRAMES_DIR, help="directory of real sample images")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    configure_threads()
+    reference = load_eager_deepfake_model()
+    frames = parity_inputs(args.samples, frames_dir=args.frames_dir)
+    for engine in args.engines.split(","):
+        for quantize in QUANTIZATIONS:
+            for channels_last in (False, True):
+                entry = {"engine": engine, "quantize": quantize, "channels_last": channels_last}
+                try:
+                    candidate = optimize(reference, engine, quantize, channels_last)
+                    entry.update(parity_check(reference, candidate, frames))
+                    with torch.no_grad():
+                        started = time.perf_counter()
+                        for _ in range(args.repeats):
+                            candidate.classify_frames(candidate.extract_features(frames))
+                    entry["ms_per_frame"] = (time.perf_counter() - started) * 1000 / (args.repeats * len(frames))
+                    entry["megabytes"] = candidate.engine_info["megabytes"]
+                except Exception as e:
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                print(json.dumps(entry))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from backend.metrics import span
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+# Frames are shrunk so their longer side is at most this before detection (0 keeps full size)
+FACE_DETECTION_MAX_SIDE = int(os.environ.get("FACE_DETECTION_MAX_SIDE", "160"))
+# Threads running detectMultiScale across the frames of one request (OpenCV releases the GIL)
+FACE_DETECTION_WORKERS = int(os.environ.get("FACE_DETECTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# CascadeClassifier isn't safe to share between threads, so each thread loads its own once
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def cascade():
+    classifier = getattr(_local, "cascade", None)
+    if classifier is None:
+        classifier = _local.cascade = cv2.CascadeClassifier(CASCADE_PATH)
+        if classifier.empty():
+            raise RuntimeError(f"Could not load face cascade from {CASCADE_PATH}")
+    return classifier
+
+
+def detect_faces(image, rgb=False, max_side=None):
+    """Face boxes (x, y, w, h) in the image's own coordinates.
+
+    Detection runs on a grayscale copy downscaled to max_side
+    (FACE_DETECTION_MAX_SIDE by default) and boxes are scaled back up.
+    """
+    max_side = FACE_DETECTION_MAX_SIDE if max_side is None else max_side
+    with span("face_detection"):
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        scale = 1.0
+        if max_side and max(height, width) > max_side:
+            scale = max_side / max(height, width)
+            gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                              interpolation=cv2.INTER_AREA)
+        faces = cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+    return [tuple(int(round(v / scale)) for v in face) for face in faces]
+
+
+def _reset_pool():
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+# A forked inference worker inherits the pool object but none of its threads
+os.register_at_fork(after_in_child=_reset_pool)
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=FACE_DETECTION_WORKERS, thread_name_prefix="face-detect")
+    return _pool
+
+
+def detect_faces_batch(images, rgb=False, max_side=None):
+    """detect_faces over many frames, spread across the detection thread pool, in input order"""
+    if len(images) <= 1 or FACE_DETECTION_WORKERS <= 1:
+        return [detect_faces(image, rgb, max_side) for image in images]
+    # Each task runs in a copy of the caller's context so its spans reach the request profile
+    futures = [
+        pool().submit(contextvars.copy_context().run, detect_faces, image, rgb, max_side)
+        for image in images
+    ]
+    return [future.result() for future in futures]
+
+
+def draw_faces(img_bgr, faces, color=(0, 255, 0), thickness=2):
+    for (x, y, w, h) in faces:
+        cv2.rectangle(img_bgr, (x, y), (x + w, y + h), color, thickness)
+    return img_bgr
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import torch
+
+# Each entry is one 2048-float ResNeXt embedding (8 KB)
+FEATURE_CACHE_MAX_FRAMES = int(os.environ.get("FEATURE_CACHE_MAX_FRAMES", "4096"))
+# "exact" keys on the frame pixels; "perceptual" also matches re-encoded, near-identical frames
+FEATURE_CACHE_HASH = os.environ.get("FEATURE_CACHE_HASH", "exact")
+
+
+def exact_hash(frame):
+    return hashlib.blake2b(np.ascontiguousarray(frame).tobytes(), digest_size=16).hexdigest()
+
+
+def perceptual_hash(frame):
+    """Hash of a 32x32 grayscale thumbnail quantized to 64 levels"""
+    small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY), (32, 32), interpolation=cv2.INTER_AREA)
+    return hashlib.blake2b((small >> 2).tobytes(), digest_size=16).hexdigest()
+
+
+HASHES = {
+    "exact": exact_hash,
+    "perceptual": perceptual_hash,
+}
+
+
+class FeatureCache:
+    """LRU of per-frame backbone embeddings keyed by frame hash"""
+
+    def __init__(self, max_frames=FEATURE_CACHE_MAX_FRAMES, hash_mode=FEATURE_CACHE_HASH):
+        if hash_mode not in HASHES:
+            raise ValueError(f"Unknown frame hash: {hash_mode}")
+        self.max_frames = max_frames
+        self.hash_mode = hash_mode
+        self.frame_hash = HASHES[hash_mode]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def features(self, model, frames, raw_images, chunk_size=None):
+        """Backbone features for frames (T, C, H, W), only running the CNN on unseen frames.
+
+        raw_images holds the matching uint8 RGB frames the keys are computed from.
+        """
+        keys = [self.frame_hash(image) for image in raw_images]
+        features = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._entries.get(key)
+                if cached is not None:
+                    self._entries.move_to_end(key)
+                    features[i] = cached
+        misses = [i for i, feature in enumerate(features) if feature is None]
+
+        if misses:
+            computed = model.extract_features(frames[misses], chunk_size)
+            with self._lock:
+                for i, feature in zip(misses, computed):
+                    # Own copy, so a cached row doesn't pin the whole batch
+                    feature = feature.clone()
+                    features[i] = feature
+                    self._entries[keys[i]] = feature
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.max_frames:
+                    self._entries.popitem(last=False)
+
+        with self._lock:
+            self.hits += len(keys) - len(misses)
+            self.misses += len(misses)
+
+        return torch.stack(features) if features else frames.new_zeros((0, 2048))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "frames": len(self._entries),
+            "max_frames": self.max_frames,
+            "hash": self.hash_mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+
+# Side length of the square frames fed to the model and shown as thumbnails
+FRAME_SIZE = 224
+
+
+def sample_indices(total_frames, num_frames):
+    """Evenly spaced frame indices across a clip of total_frames frames"""
+    return np.linspace(0, max(total_frames - 1, 0), num_frames, dtype=np.int32)
+
+
+def count_frames(video_path):
+    """Count decodable frames by grabbing through the stream without decoding pixels"""
+    cap = cv2.VideoCapture(video_path)
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+def frame_count(video_path):
+    """Frame count from the container header, counted by grabbing when it reports none"""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if total_frames <= 0:
+        total_frames = count_frames(video_path)
+    return total_frames
+
+
+def read_frames(video_path, frame_idxs, out=None):
+    """Decode the video forward once, keeping only the frames at frame_idxs.
+
+    Frames are resized and converted to RGB straight into `out`, a uint8
+    (T, FRAME_SIZE, FRAME_SIZE, 3) buffer that is allocated if not given.
+    Returns (out, filled, frames_seen): `filled` slots were written and
+    `frames_seen` is how far into the stream decoding got.
+    """
+    frame_idxs = np.asarray(frame_idxs)
+    if out is None:
+        out = np.empty((len(frame_idxs), FRAME_SIZE, FRAME_SIZE, 3), dtype=np.uint8)
+
+    cap = cv2.VideoCapture(video_path)
+    position = 0  # index of the next frame the decoder will return
+    filled = 0
+    try:
+        for slot, idx in enumerate(frame_idxs):
+            # Indices repeat when the clip has fewer frames than requested
+            if slot > 0 and idx == frame_idxs[slot - 1]:
+                out[slot] = out[slot - 1]
+                filled += 1
+                continue
+
+            # Skip ahead with grab(), which demuxes without decoding to BGR
+            while position < idx and cap.grab():
+                position += 1
+            if position < idx:
+                break
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position += 1
+
+            resized = cv2.resize(frame, (FRAME_SIZE, FRAME_SIZE))
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=out[slot])
+            filled += 1
+    finally:
+        cap.release()
+
+    return out, filled, position
+
+
+def extract_frames(video_path, num_frames=16):
+    """Sample num_frames evenly spaced RGB frames as one uint8 (T, H, W, 3) array.
+
+    Falls back to counting frames when the container reports no frame count,
+    and resamples over the frames actually decoded when the reported count
+    turns out to be too high.
+    """
+    total_frames = frame_count(video_path)
+    frames, filled, frames_seen = read_frames(video_path, sample_indices(total_frames, num_frames))
+
+    if filled < num_frames and 0 < frames_seen < total_frames:
+        # The header over-reported the length; sample again over what decodes
+        frames, filled, _ = read_frames(video_path, sample_indices(frames_seen, num_frames), out=frames)
+
+    return frames, filled
@@ -1,128 +1,196 @@
+# Before cv2: image_ingest sets OpenCV's decoder pixel cap
+from backend import image_ingest
 import torch
 import numpy as np
 import cv2
 import os
-import base64
-from io import BytesIO
-from PIL import Image
-from backend.model_defs.model import DeepfakeDetectionModel
-
-# Use the same model as video detection
-MODEL_PATH = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..", "models", "video", "ResNext + LSTM.pt")
-)
-
-# Load the model once
-model = DeepfakeDetectionModel()
-model.load_state_dict(torch.load(MODEL_PATH, map_location=torch.device("cpu")), strict=False)
-model.eval()
-
-async def predict_image(file):
-    """Predict if an image is AI-generated using the video deepfake model"""
+from backend.media import render_image
+from backend.metrics import span
+from backend.model_defs import face_detector
+from backend.model_defs.registry import DEEPFAKE_MODEL_VERSION, get_deepfake_model
+
+# Same ResNeXt + LSTM instance as the video detector
+model = get_deepfake_model()
+MODEL_VERSION = DEEPFAKE_MODEL_VERSION
+
+# Images per ResNeXt forward pass on the batch endpoint and for heatmap masks
+IMAGE_BATCH_CHUNK_SIZE = int(os.environ.get("IMAGE_BATCH_CHUNK_SIZE", "16"))
+
+# Supported occlusion heatmap resolutions (patches per side on 224x224)
+HEATMAP_GRIDS = (4, 7, 14)
+
+def decode_image(contents):
+    """Decode uploaded bytes into a 224x224 BGR image (see backend.image_ingest)"""
+    return image_ingest.decode_image(contents)
+
+def to_tensor(img, out=None, bgr=False):
+    """Normalize a uint8 (H, W, 3) image into an RGB (C, H, W) float tensor.
+
+    Writes into `out` (e.g. one slot of a preallocated batch) when given;
+    bgr=True takes an OpenCV BGR image and swaps the channels in the same pass.
+    """
+    chw = img.transpose(2, 0, 1)
+    if bgr:
+        chw = chw[::-1]
+    if out is None:
+        out = torch.empty(chw.shape, dtype=torch.float32)
+    np.divide(chw, 255.0, out=out.numpy(), dtype=np.float32)
+    return out
+
+def label_prob(prob):
+    label = "AI-generated" if prob > 0.5 else "Real"
+    confidence = float(prob if label == "AI-generated" else 1 - prob)
+    return label, confidence
+
+def predict_images(items):
+    """Score several images in one batched forward pass, keeping input order.
+
+    `items` holds raw image bytes, or an exception for uploads that already
+    failed; those and undecodable images get an {"error": ...} entry.
+    """
+    results = [None] * len(items)
+    size = image_ingest.TARGET_SIZE
+    # Each image is normalized straight into its slot of one batch tensor
+    batch = torch.empty((len(items), 3, size, size), dtype=torch.float32)
+    positions = []
+    for i, contents in enumerate(items):
+        if isinstance(contents, Exception):
+            results[i] = {"error": str(contents)}
+            continue
+        try:
+            img_resized = decode_image(contents)
+        except Exception as e:
+            results[i] = {"error": str(e)}
+            continue
+        to_tensor(img_resized, out=batch[len(positions)], bgr=True)
+        positions.append(i)
+
+    if positions:
+        try:
+            with span("forward"), torch.no_grad():
+                features = model.extract_features(batch[:len(positions)], IMAGE_BATCH_CHUNK_SIZE)
+                probs = model.classify_frames(features).tolist()
+        except Exception as e:
+            probs = [e] * len(positions)
+
+        for i, prob in zip(positions, probs):
+            if isinstance(prob, Exception):
+                results[i] = {"error": str(prob)}
+                continue
+            label, confidence = label_prob(prob)
+            results[i] = {"label": label, "confidence": round(confidence, 4)}
+
+    return results
+
+def predict_image(contents, explain=False, heatmap_grid=4, media="inline", image_format=None, image_quality=None,
+                  detect_faces=True):
+    """Predict if an image is AI-generated using the video deepfake model.
+
+    The occlusion heatmap (heatmap_grid x heatmap_grid patches) is only
+    generated when explain is set. media/image_format/image_quality control
+    how the annotated image and heatmap are returned (see backend.media).
+    detect_faces=False skips face detection (no boxes, face count or face explanations).
+    """
     try:
-        # Read the image file
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            return {"error": "Could not read image file"}
-        
-        # Resize and preprocess the image
-        img_resized = cv2.resize(img, (224, 224))
-        img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
-        
-        # Store the raw image for visualization
-        raw_img = img_rgb.copy()
-        
-        # Normalize and convert to tensor
-        img_tensor = torch.tensor(img_rgb.astype(np.float32) / 255.0)
-        img_tensor = img_tensor.permute(2, 0, 1).unsqueeze(0).unsqueeze(0)  # (1, 1, C, H, W)
+        # Decode the uploaded bytes (see backend.uploads.read_upload)
+        try:
+            img_resized = decode_image(contents)
+        except ValueError as e:
+            return {"error": str(e)}
         
-        # Face detection for visualization
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        gray = cv2.cvtColor(img_resized, cv2.COLOR_BGR2GRAY)
+        # Normalize and convert to tensor, swapping BGR to RGB in the same pass
+        img_tensor = to_tensor(img_resized, bgr=True).unsqueeze(0).unsqueeze(0)  # (1, 1, C, H, W)
+
+        # The heatmap is drawn on the image without face boxes
+        img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB) if explain else None
         
-        try:
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-            for (x, y, w, h) in faces:
-                cv2.rectangle(img_resized, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        except Exception:
-            # If face detection fails, continue without drawing boxes
-            pass
+        # Face detection for visualization and the face count
+        faces = None
+        if detect_faces:
+            try:
+                faces = face_detector.detect_faces(img_resized)
+                face_detector.draw_faces(img_resized, faces)
+            except Exception:
+                # If face detection fails, continue without drawing boxes
+                pass
         
         # Get model prediction
-        with torch.no_grad():
+        with span("forward"), torch.no_grad():
             output = model(img_tensor)
             prob = output.item() if output.numel() == 1 else output[0][0].item()
             
         # Determine label and confidence
-        label = "AI-generated" if prob > 0.5 else "Real"
-        confidence = float(prob if label == "AI-generated" else 1 - prob)
-        
-        # Generate heatmap for explainability
-        # This is a simplified version - for true LIME you'd need more complex implementation
-        heatmap = generate_simple_heatmap(img_rgb, model)
-        
-        # Convert images to base64 for frontend
-        boxed_img = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(boxed_img)
-        buffered = BytesIO()
-        pil_img.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        
-        # Convert heatmap to base64
-        heatmap_pil = Image.fromarray(heatmap)
-        heatmap_buffered = BytesIO()
-        heatmap_pil.save(heatmap_buffered, format="JPEG")
-        heatmap_str = base64.b64encode(heatmap_buffered.getvalue()).decode("utf-8")
+        label, confidence = label_prob(prob)
         
         # Generate explanations
         lime_explanations = generate_explanations(label, confidence, faces)
         
-        return {
+        result = {
             "label": label,
             "confidence": round(confidence, 4),
-            "image": f"data:image/jpeg;base64,{img_str}",
-            "heatmap_image": f"data:image/jpeg;base64,{heatmap_str}",
             "lime_explanations": lime_explanations
         }
+        if faces is not None:
+            result["faces"] = len(faces)
+
+        # Encode the annotated image for frontend (left out when media="none")
+        image = render_image(img_resized, media, image_format, image_quality)
+        if image is not None:
+            result["image"] = image
+
+        if explain:
+            # Generate heatmap for explainability
+            # This is a simplified version - for true LIME you'd need more complex implementation
+            with span("heatmap"):
+                heatmap = generate_simple_heatmap(img_rgb, model, grid=heatmap_grid)
+
+            heatmap_image = render_image(heatmap, media, image_format, image_quality)
+            if heatmap_image is not None:
+                result["heatmap_image"] = heatmap_image
+
+        return result
         
     except Exception as e:
         import traceback
         traceback.print_exc()
         return {"error": str(e)}
 
-def generate_simple_heatmap(img, model):
-    """Generate a simple heatmap for explainability"""
+def generate_simple_heatmap(img, model, grid=4, chunk_size=None):
+    """Generate an occlusion heatmap for explainability.
+
+    The image is split into a grid x grid set of patches; each masked copy
+    keeps one patch visible, and all copies are scored in batched forward
+    passes of chunk_size images. Takes an RGB image and returns the blended
+    heatmap as BGR, ready for cv2.imencode.
+    """
     # Create a heatmap by analyzing different regions of the image
     # This is a simplified approach - not true LIME but gives visual explanation
     
     height, width = img.shape[:2]
     heatmap = np.zeros((height, width), dtype=np.float32)
     
-    # Create a grid of patches
-    patch_size = 56  # 4x4 grid on 224x224 image
+    # Patch boundaries of the grid (a 4x4 grid gives 56px patches on 224x224)
+    ys = np.linspace(0, height, grid + 1, dtype=np.int64)
+    xs = np.linspace(0, width, grid + 1, dtype=np.int64)
+    patches = [(ys[r], ys[r + 1], xs[c], xs[c + 1]) for r in range(grid) for c in range(grid)]
+
+    img_tensor = to_tensor(img)  # (C, H, W)
+    chunk_size = chunk_size or IMAGE_BATCH_CHUNK_SIZE
     
-    for y in range(0, height, patch_size):
-        for x in range(0, width, patch_size):
-            # Create a masked version of the image with this patch visible
-            masked_img = np.zeros_like(img)
-            y_end = min(y + patch_size, height)
-            x_end = min(x + patch_size, width)
-            
-            masked_img[y:y_end, x:x_end] = img[y:y_end, x:x_end]
-            
-            # Get prediction for this masked image
-            masked_tensor = torch.tensor(masked_img.astype(np.float32) / 255.0)
-            masked_tensor = masked_tensor.permute(2, 0, 1).unsqueeze(0).unsqueeze(0)
-            
-            with torch.no_grad():
-                output = model(masked_tensor)
-                prob = output.item() if output.numel() == 1 else output[0][0].item()
-            
-            # Fill the heatmap region with the probability
-            heatmap[y:y_end, x:x_end] = prob
+    with torch.no_grad():
+        for start in range(0, len(patches), chunk_size):
+            chunk = patches[start:start + chunk_size]
+
+            # Masked copies of the image, each with one patch visible
+            masked = img_tensor.new_zeros((len(chunk),) + tuple(img_tensor.shape))
+            for i, (y, y_end, x, x_end) in enumerate(chunk):
+                masked[i, :, y:y_end, x:x_end] = img_tensor[:, y:y_end, x:x_end]
+
+            probs = model.classify_frames(model.extract_features(masked)).tolist()
+
+            # Fill each heatmap region with its probability
+            for (y, y_end, x, x_end), prob in zip(chunk, probs):
+                heatmap[y:y_end, x:x_end] = prob
     
     # Normalize and colorize the heatmap
     heatmap = cv2.normalize(heatmap, None, 0, 255, cv2.NORM_MINMAX)
@@ -132,9 +200,8 @@ def generate_simple_heatmap(img, model):
     # Blend with original image
     original_img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
     blended = cv2.addWeighted(original_img, 0.7, heatmap, 0.3, 0)
-    blended_rgb = cv2.cvtColor(blended, cv2.COLOR_BGR2RGB)
     
-    return blended_rgb
+    return blended
 
 def generate_explanations(label, confidence, faces):
     """Generate human-readable explanations based on the model's prediction"""
@@ -143,15 +210,15 @@ def generate_explanations(label, confidence, faces):
     # Add overall explanation
     explanations.append(f"Model detected {label} image with {round(confidence*100)}% confidence")
     
-    # Add face-related explanations
-    if len(faces) > 0:
+    # Add face-related explanations (faces is None when detection was turned off)
+    if faces is not None and len(faces) > 0:
         explanations.append(f"Detected {len(faces)} face(s) in the image")
         if label == "AI-generated":
             explanations.append("Check facial features for unnatural smoothness or asymmetry")
             explanations.append("Examine eye details, reflections, and pupil shapes")
         else:
             explanations.append("Facial features appear natural and consistent")
-    else:
+    elif faces is not None:
         if label == "AI-generated":
             explanations.append("No faces detected - examine overall image consistency")
         else:
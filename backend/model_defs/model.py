@@ -3,10 +3,11 @@ import torch.nn as nn
 from torchvision import models
 
 class DeepfakeDetectionModel(nn.Module):
-    def __init__(self):
+    def __init__(self, backbone_weights=None):
         super(DeepfakeDetectionModel, self).__init__()
 
-        backbone = models.resnext50_32x4d(weights="DEFAULT")
+        # Our checkpoint overwrites the backbone, so ImageNet weights are opt-in
+        backbone = models.resnext50_32x4d(weights=backbone_weights)
         self.cnn = nn.Sequential(*list(backbone.children())[:-1])  # remove final FC
         self.lstm = nn.LSTM(input_size=2048, hidden_size=2048, batch_first=True)
         self.classifier = nn.Linear(2048, 1)
@@ -19,4 +20,25 @@ class DeepfakeDetectionModel(nn.Module):
 
         lstm_out, _ = self.lstm(features)
         out = self.classifier(lstm_out[:, -1, :])
-        return out
\ No newline at end of file
+        return out
+
+    def extract_features(self, frames, chunk_size=None):  # frames: (N, C, H, W)
+        """Run the CNN backbone over a flat batch of frames, chunk_size at a time."""
+        N = frames.shape[0]
+        chunk_size = chunk_size or N
+        features = []
+        with torch.no_grad():
+            for start in range(0, N, chunk_size):
+                chunk = frames[start:start + chunk_size]
+                features.append(self.cnn(chunk).view(chunk.shape[0], 2048))
+        return torch.cat(features) if features else frames.new_zeros((0, 2048))
+
+    def classify_frames(self, features):  # features: (N, 2048)
+        """Score every frame as its own one-step sequence, like forward() on (1, 1, C, H, W)."""
+        lstm_out, _ = self.lstm(features.unsqueeze(1))
+        return self.classifier(lstm_out[:, -1, :]).view(-1)
+
+    def classify_sequence(self, features):  # features: (T, 2048)
+        """Score all frames as one T-step sequence through the LSTM."""
+        lstm_out, _ = self.lstm(features.unsqueeze(0))
+        return self.classifier(lstm_out[:, -1, :]).view(())
@@ -0,0 +1,90 @@
+import os
+import threading
+
+import torch
+
+from backend.cache import file_version
+from backend.model_defs import engine
+from backend.model_defs.model import DeepfakeDetectionModel
+
+# Shared checkpoint for both the image and video detectors
+DEEPFAKE_MODEL_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "models", "video", "ResNext + LSTM.pt")
+)
+
+# Changes whenever the checkpoint is replaced; part of every result cache key.
+# int8 weights shift scores slightly, so quantized results are cached apart.
+DEEPFAKE_MODEL_VERSION = file_version(DEEPFAKE_MODEL_PATH)
+if engine.INFERENCE_QUANTIZE != "none":
+    DEEPFAKE_MODEL_VERSION += f"-{engine.INFERENCE_QUANTIZE}"
+
+# Every weight under these modules must come from the checkpoint; the backbone
+# starts out random, so a missing key would silently serve an untrained model
+REQUIRED_PREFIXES = ("cnn.", "lstm.", "classifier.")
+
+_models = {}
+_lock = threading.Lock()
+
+
+def load_eager_deepfake_model():
+    """Build the ResNeXt + LSTM architecture without ImageNet weights and load our checkpoint"""
+    model = DeepfakeDetectionModel()
+    keys = model.load_state_dict(torch.load(DEEPFAKE_MODEL_PATH, map_location=torch.device("cpu")), strict=False)
+    missing = [key for key in keys.missing_keys if key.startswith(REQUIRED_PREFIXES)]
+    if missing:
+        shown = ", ".join(missing[:5]) + (f" and {len(missing) - 5} more" if len(missing) > 5 else "")
+        raise RuntimeError(f"Checkpoint {DEEPFAKE_MODEL_PATH} is missing {len(missing)} weights: {shown}")
+    model.eval()
+    return model
+
+
+def load_deepfake_model():
+    """The checkpoint run through the inference engine configured in backend.model_defs.engine"""
+    return engine.prepare(load_eager_deepfake_model())
+
+
+LOADERS = {
+    "deepfake": load_deepfake_model,
+}
+
+
+def get_model(name):
+    """Return the process-wide instance of a model, loading it on first use"""
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = LOADERS[name]()
+    return model
+
+
+def get_deepfake_model():
+    return get_model("deepfake")
+
+
+def share_memory():
+    """Move the weights of every loaded model into shared memory, before forking workers"""
+    for model in _models.values():
+        model.share_memory()
+
+
+def model_memory(model):
+    """Parameter and buffer footprint of a torch module"""
+    parameters = sum(p.numel() for p in model.parameters())
+    param_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    buffer_bytes = sum(b.numel() * b.element_size() for b in model.buffers())
+    return {
+        "parameters": parameters,
+        "bytes": param_bytes + buffer_bytes,
+        "megabytes": round((param_bytes + buffer_bytes) / (1024 * 1024), 1),
+    }
+
+
+def memory_report():
+    """Memory footprint and inference engine of every model loaded so far"""
+    report = {}
+    for name, model in _models.items():
+        # Optimized models measure themselves; frozen and int8 weights aren't parameters()
+        report[name] = dict(model_memory(model), **getattr(model, "engine_info", {}))
+    return report
@@ -5,6 +5,9 @@ import numpy as np
 from lime.lime_text import LimeTextExplainer
 import re
 
+from backend.cache import file_version
+from backend.metrics import span
+
 # Absolute paths to text model components
 VECTORIZER_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "models", "text", "vectorizer_model")
@@ -17,38 +20,55 @@ MODEL_PATH = os.path.abspath(
 vectorizer_model = tf.keras.layers.TFSMLayer(VECTORIZER_PATH, call_endpoint="serving_default")
 main_model = tf.keras.layers.TFSMLayer(MODEL_PATH, call_endpoint="serving_default")
 
-def predict_text(text: str, explain=False):
-    try:
-        input_tensor = tf.constant([[text]])  # shape (1, 1)
-        vectorized = vectorizer_model(input_tensor)
+# Changes whenever either saved model is replaced; part of every result cache key
+MODEL_VERSION = file_version(VECTORIZER_PATH, MODEL_PATH)
 
-        # If wrapped in a dict, unwrap it
-        if isinstance(vectorized, dict):
-            vectorized = list(vectorized.values())[0]
+# LIME defaults; perturbed samples are scored LIME_BATCH_SIZE at a time
+LIME_NUM_FEATURES = 10
+LIME_NUM_SAMPLES = 100
+LIME_BATCH_SIZE = int(os.environ.get("LIME_BATCH_SIZE", "128"))
 
-        output = main_model(vectorized)
+def _unwrap(output):
+    """TFSMLayer outputs may come wrapped in a dict"""
+    if isinstance(output, dict):
+        output = output["predictions"] if "predictions" in output else list(output.values())[0]
+    return output
 
-        # If wrapped in a dict, unwrap
-        if isinstance(output, dict):
-            output = output.get("predictions") or list(output.values())[0]
+def score_texts(texts):
+    """Score a batch of texts with one vectorizer and one model call.
 
-        # Convert to float
-        if isinstance(output, tf.Tensor):
-            output = output.numpy()
+    Returns the AI-generated probability of each text, in input order.
+    """
+    if not texts:
+        return []
+    input_tensor = tf.constant([[text] for text in texts])  # shape (N, 1)
+    with span("vectorizer"):
+        vectorized = _unwrap(vectorizer_model(input_tensor))
+    with span("forward"):
+        output = _unwrap(main_model(vectorized))
 
-        score = float(output[0][0]) if hasattr(output[0], '__getitem__') else float(output[0])
+    # Convert to float
+    if isinstance(output, tf.Tensor):
+        output = output.numpy()
+
+    return np.asarray(output, dtype=np.float32).reshape(len(texts), -1)[:, 0].tolist()
+
+def label_score(score):
+    """Turn an AI-generated probability into the label/confidence response"""
+    label = "AI-generated" if score > 0.5 else "Human-written"
+    confidence = score if label == "AI-generated" else 1 - score
+    return {
+        "label": label,
+        "confidence": round(float(confidence), 4)
+    }
+
+def predict_text(text: str, explain=False):
+    try:
+        result = label_score(score_texts([text])[0])
 
-        label = "AI-generated" if score > 0.5 else "Human-written"
-        confidence = score if label == "AI-generated" else 1 - score
-        
-        result = {
-            "label": label,
-            "confidence": round(confidence, 4)
-        }
-        
         # Add LIME explanations if requested
         if explain:
-            lime_result = generate_lime_explanation(text, label)
+            lime_result = generate_lime_explanation(text, result["label"])
             result.update(lime_result)
             
         return result
@@ -56,45 +76,62 @@ def predict_text(text: str, explain=False):
     except Exception as e:
         return {"error": str(e)}
 
-def model_predict_fn(texts):
-    """Wrapper function for LIME to use our model"""
-    results = []
-    for text in texts:
-        input_tensor = tf.constant([[text]])
-        vectorized = vectorizer_model(input_tensor)
-        
-        # If wrapped in a dict, unwrap it
-        if isinstance(vectorized, dict):
-            vectorized = list(vectorized.values())[0]
-            
-        output = main_model(vectorized)
-        
-        # If wrapped in a dict, unwrap
-        if isinstance(output, dict):
-            output = output.get("predictions") or list(output.values())[0]
-            
-        # Convert to float
-        if isinstance(output, tf.Tensor):
-            output = output.numpy()
-            
-        score = float(output[0][0]) if hasattr(output[0], '__getitem__') else float(output[0])
-        results.append([1-score, score])  # [human_prob, ai_prob]
-    
-    return np.array(results)
+def predict_texts(texts, batch_size=64):
+    """Label many texts in batched model calls, keeping input order.
+
+    Each item gets its own result; an empty text or a text the model
+    rejects yields an {"error": ...} entry without failing the others.
+    """
+    results = [None] * len(texts)
+    valid = []
+    for i, text in enumerate(texts):
+        if text.strip():
+            valid.append(i)
+        else:
+            results[i] = {"error": "Empty text"}
+
+    for start in range(0, len(valid), batch_size):
+        chunk = valid[start:start + batch_size]
+        try:
+            scores = score_texts([texts[i] for i in chunk])
+        except Exception:
+            # Retry one by one so a single bad item doesn't sink the batch
+            scores = []
+            for i in chunk:
+                try:
+                    scores.append(score_texts([texts[i]])[0])
+                except Exception as e:
+                    scores.append(e)
+
+        for i, score in zip(chunk, scores):
+            results[i] = {"error": str(score)} if isinstance(score, Exception) else label_score(score)
+
+    return results
+
+def model_predict_fn(texts, batch_size=None):
+    """Wrapper function for LIME to use our model, scoring perturbations in batches"""
+    batch_size = batch_size or LIME_BATCH_SIZE
+    scores = []
+    for start in range(0, len(texts), batch_size):
+        scores.extend(score_texts(list(texts[start:start + batch_size])))
+
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.stack([1 - scores, scores], axis=1)  # [human_prob, ai_prob]
 
-def generate_lime_explanation(text, label):
+def generate_lime_explanation(text, label, num_features=LIME_NUM_FEATURES, num_samples=LIME_NUM_SAMPLES):
     """Generate LIME explanations for the model's prediction"""
     try:
         # Initialize LIME explainer
         explainer = LimeTextExplainer(class_names=["Human-written", "AI-generated"])
         
         # Generate explanation
-        exp = explainer.explain_instance(
-            text, 
-            model_predict_fn, 
-            num_features=10,
-            num_samples=100
-        )
+        with span("lime"):
+            exp = explainer.explain_instance(
+                text, 
+                model_predict_fn, 
+                num_features=num_features,
+                num_samples=num_samples
+            )
         
         # Get the explanation for the predicted class
         class_idx = 1 if label == "AI-generated" else 0
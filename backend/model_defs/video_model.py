@@ -1,102 +1,234 @@
 import torch
 import numpy as np
 import cv2
+import math
 import os
-import tempfile
-import base64
-from io import BytesIO
-from PIL import Image
-from backend.model_defs.model import DeepfakeDetectionModel
-
-
-# Load model
-MODEL_PATH = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..", "models", "video", "ResNext + LSTM.pt")
-)
-
-model = DeepfakeDetectionModel()
-model.load_state_dict(torch.load(MODEL_PATH, map_location=torch.device("cpu")), strict=False)
-model.eval()
-
-def extract_frames(video_path, num_frames=16):
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    frame_idxs = np.linspace(0, total_frames - 1, num_frames, dtype=np.int32)
-
-    frames = []
-    raw_images = []  # Store raw images as numpy arrays directly
-    
-    for idx in frame_idxs:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-        if ret:
-            # Store the raw frame before normalization
-            raw_frame = cv2.resize(frame, (224, 224))
-            raw_frame_rgb = cv2.cvtColor(raw_frame, cv2.COLOR_BGR2RGB)
-            raw_images.append(raw_frame_rgb)
-            
-            # Process frame for model input
-            frame = cv2.resize(frame, (224, 224))
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frames.append(frame)
-    cap.release()
-
-    if len(frames) != num_frames:
+from backend.media import render_image
+from backend.metrics import span
+from backend.model_defs.registry import DEEPFAKE_MODEL_VERSION, get_deepfake_model
+from backend.model_defs import face_detector, frame_reader
+from backend.model_defs.feature_cache import FeatureCache
+
+
+# Same ResNeXt + LSTM instance as the image detector
+model = get_deepfake_model()
+MODEL_VERSION = DEEPFAKE_MODEL_VERSION
+
+# Frames pushed through the ResNeXt backbone per forward pass; caps peak memory
+FRAME_CHUNK_SIZE = int(os.environ.get("VIDEO_FRAME_CHUNK_SIZE", "16"))
+
+# Backbone embeddings of frames seen before, so re-analysed clips only pay for new frames
+feature_cache = FeatureCache()
+
+# Adaptive sampling: frame budgets and the confidence the running vote must reach
+ADAPTIVE_MIN_FRAMES = int(os.environ.get("VIDEO_ADAPTIVE_MIN_FRAMES", "4"))
+ADAPTIVE_MAX_FRAMES = int(os.environ.get("VIDEO_ADAPTIVE_MAX_FRAMES", "32"))
+ADAPTIVE_CONFIDENCE = float(os.environ.get("VIDEO_ADAPTIVE_CONFIDENCE", "0.8"))
+
+def to_tensor(raw_images):
+    """Normalize uint8 (T, H, W, 3) RGB frames into a (T, C, H, W) float tensor"""
+    return torch.from_numpy(raw_images).permute(0, 3, 1, 2).float().div_(255.0)
+
+def extract_frames(video_path, num_frames=16, allow_partial=False):
+    # One forward decode into a shared uint8 (T, 224, 224, 3) RGB buffer
+    with span("extract_frames"):
+        raw_images, filled = frame_reader.extract_frames(video_path, num_frames)
+
+    if filled == 0 or (filled != num_frames and not allow_partial):
         raise ValueError("Not enough frames extracted.")
+    raw_images = raw_images[:filled]
 
     # Process frames for model input
-    frames = np.stack(frames).astype(np.float32) / 255.0
-    frames = torch.tensor(frames).permute(0, 3, 1, 2)  # (T, C, H, W)
-    
-    return [f.unsqueeze(0).unsqueeze(0) for f in frames], raw_images  # list of (1, 1, C, H, W), list of numpy arrays
+    frames = to_tensor(raw_images)  # (T, C, H, W)
+
+    return frames, raw_images  # (T, C, H, W) tensor, (T, H, W, 3) uint8 array
+
+def frame_features(frames, raw_images=None, chunk_size=None):
+    """Backbone features for frames, served from the feature cache when raw_images are given"""
+    with span("backbone"), torch.no_grad():
+        if raw_images is not None:
+            return feature_cache.features(model, frames, raw_images, chunk_size or FRAME_CHUNK_SIZE)
+        return model.extract_features(frames, chunk_size or FRAME_CHUNK_SIZE)
+
+def classify_features(features, sequence=False):
+    """Per-frame probabilities, plus the LSTM score over all frames when sequence=True"""
+    with span("classifier"), torch.no_grad():
+        frame_probs = model.classify_frames(features).tolist()
+        sequence_prob = model.classify_sequence(features).item() if sequence else None
+    return frame_probs, sequence_prob
+
+def score_frames(frames, chunk_size=None, sequence=False, raw_images=None):
+    """Score all frames with one batched backbone pass.
+
+    Returns per-frame probabilities identical to calling the model on each
+    (1, 1, C, H, W) frame, plus the LSTM score over all T frames when
+    sequence=True (otherwise None). Given the uint8 raw_images, backbone
+    features come from the feature cache and only unseen frames hit the CNN.
+    """
+    return classify_features(frame_features(frames, raw_images, chunk_size), sequence=sequence)
+
+def vote_is_decisive(frame_probs, confidence_threshold, z=1.96):
+    """Sequential stopping rule for adaptive sampling.
+
+    Stops once the majority label is significant (the Wilson lower bound of
+    its share of votes is above one half) and the frames voting for it are
+    on average at least confidence_threshold confident.
+    """
+    n = len(frame_probs)
+    if n == 0:
+        return False
+    fake = [p for p in frame_probs if p > 0.5]
+    real = [p for p in frame_probs if p <= 0.5]
+    majority = fake if len(fake) >= len(real) else real
+    share = len(majority) / n
+    lower_bound = (
+        share + z * z / (2 * n) - z * math.sqrt(share * (1 - share) / n + z * z / (4 * n * n))
+    ) / (1 + z * z / n)
+    mean_confidence = sum(p if majority is fake else 1 - p for p in majority) / len(majority)
+    return lower_bound > 0.5 and mean_confidence >= confidence_threshold
+
+def refine_indices(sampled, total_frames, budget):
+    """Midpoints between neighbouring sampled frames, widest gaps first, at most budget of them"""
+    bounds = sorted(sampled)
+    gaps = sorted(zip(bounds, bounds[1:]), key=lambda gap: gap[0] - gap[1])
+    midpoints = [(a + b) // 2 for a, b in gaps if b - a > 1][:budget]
+    if len(midpoints) < budget and bounds and bounds[-1] < total_frames - 1:
+        midpoints.append(total_frames - 1)
+    return sorted(set(midpoints) - set(sampled))[:budget]
+
+def adaptive_sample(video_path, min_frames, max_frames, confidence_threshold):
+    """Score frames in rounds, adding frames only while the running vote is uncertain.
+
+    All max_frames candidate positions are decoded in one forward pass up
+    front; the rounds then pick from that buffer, so only backbone and
+    classifier work grows with each round. Returns (frame_idxs, raw_images,
+    features, early_exit, partial) in temporal order. Decoding that stops
+    short (short or corrupt videos) samples from whatever frames were read.
+    """
+    total_frames = frame_reader.frame_count(video_path)
+    positions = np.unique(frame_reader.sample_indices(total_frames, max_frames))
+    with span("extract_frames"):
+        candidates_raw, filled, _ = frame_reader.read_frames(video_path, positions)
+    if not filled:
+        raise ValueError("No frames could be decoded.")
+    # The stream ended or broke early; only what decoded is usable
+    partial = filled < len(positions)
+    positions, candidates_raw = positions[:filled], candidates_raw[:filled]
+
+    # Rounds work on slots of the decoded buffer rather than on frame indices
+    sampled = {}  # slot -> feature
+    slots = np.unique(frame_reader.sample_indices(filled, min(min_frames, filled))).tolist()
+    early_exit = False
+
+    while slots:
+        raw_images = candidates_raw[slots]
+        features = frame_features(to_tensor(raw_images), raw_images)
+        sampled.update(zip(slots, features))
+
+        ordered = sorted(sampled)
+        frame_probs, _ = classify_features(torch.stack([sampled[slot] for slot in ordered]))
+        if len(ordered) >= min_frames and vote_is_decisive(frame_probs, confidence_threshold):
+            early_exit = len(ordered) < filled
+            break
+        if len(ordered) >= filled:
+            break
+        slots = refine_indices(ordered, filled, filled - len(ordered))
+
+    ordered = sorted(sampled)
+    features = torch.stack([sampled[slot] for slot in ordered])
+    return positions[ordered].tolist(), candidates_raw[ordered], features, early_exit, partial
+
+def predict_video(
+    video_path,
+    sequence=False,
+    adaptive=False,
+    min_frames=None,
+    max_frames=None,
+    confidence_threshold=None,
+    num_frames=16,
+    progress=None,
+    media="inline",
+    image_format=None,
+    image_quality=None,
+    detect_faces=True
+):
+    """Predict if a video on disk contains deepfake content.
+
+    The caller owns video_path (see backend.uploads.spooled_upload). With
+    adaptive=True frames are sampled in rounds between min_frames and
+    max_frames until the vote reaches confidence_threshold; otherwise
+    num_frames evenly spaced frames are scored. Videos that decode fewer
+    frames than planned get a result flagged "partial" instead of an error.
+
+    progress, if given, is called as progress("stage", {"stage": ...}) when
+    a stage starts and progress("frame", frame_prediction) for each frame.
+    media/image_format/image_quality control the thumbnails (see backend.media).
+    detect_faces=False skips face detection (no boxes and no face counts).
+    """
+    def report(event, data):
+        if progress is not None:
+            progress(event, data)
 
-async def predict_video(file):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp:
-            temp.write(await file.read())
-            temp_path = temp.name
+        report("stage", {"stage": "sampling"})
+        frame_idxs = None
+        early_exit = False
 
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        video_frames, raw_images = extract_frames(temp_path)
+        if adaptive:
+            frame_idxs, raw_images, features, early_exit, partial = adaptive_sample(
+                video_path,
+                min_frames or ADAPTIVE_MIN_FRAMES,
+                max_frames or ADAPTIVE_MAX_FRAMES,
+                confidence_threshold or ADAPTIVE_CONFIDENCE
+            )
+        else:
+            video_frames, raw_images = extract_frames(video_path, num_frames, allow_partial=True)
+            partial = len(raw_images) < num_frames
+            features = frame_features(video_frames, raw_images)
         frame_predictions = []
 
-        with torch.no_grad():
-            for idx, (frame_tensor, raw_img) in enumerate(zip(video_frames, raw_images)):
-                # Get model prediction
-                output = model(frame_tensor)
-                # Extract probability - fix tensor conversion issue
-                prob = output.item() if output.numel() == 1 else output[0][0].item()
-                label = "Fake" if prob > 0.5 else "Real"
-                confidence = float(prob if label == "Fake" else 1 - prob)
+        # Get model predictions for every frame at once
+        report("stage", {"stage": "scoring", "frames": len(raw_images)})
+        frame_probs, sequence_prob = classify_features(features, sequence=sequence)
+
+        # Faces in every frame, detected across the face detection pool
+        frame_faces = None
+        if detect_faces:
+            try:
+                frame_faces = face_detector.detect_faces_batch(raw_images, rgb=True)
+            except Exception:
+                # If face detection fails, continue without boxes or counts
+                pass
+
+        for idx, (prob, raw_img) in enumerate(zip(frame_probs, raw_images)):
+            label = "Fake" if prob > 0.5 else "Real"
+            confidence = float(prob if label == "Fake" else 1 - prob)
+
+            # Add to predictions
+            frame_prediction = {
+                "frame": idx + 1,
+                "label": label,
+                "confidence": float(round(confidence, 4))  # Ensure it's a float, not tensor
+            }
+
+            if frame_faces is not None:
+                frame_prediction["faces"] = len(frame_faces[idx])
 
+            # Thumbnails with face boxes are only drawn when they are returned
+            if media != "none":
                 # Process image for display - raw_img is already a numpy array
                 img_cv = cv2.cvtColor(raw_img, cv2.COLOR_RGB2BGR)
-                gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-                
-                # Detect faces
-                try:
-                    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-                    for (x, y, w, h) in faces:
-                        cv2.rectangle(img_cv, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                except Exception:
-                    # If face detection fails, continue without drawing boxes
-                    pass
-
-                # Convert to base64 for frontend
-                boxed_img = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-                pil_img = Image.fromarray(boxed_img)
-                buffered = BytesIO()
-                pil_img.save(buffered, format="JPEG")
-                img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                img_data_uri = f"data:image/jpeg;base64,{img_str}"
-
-                # Add to predictions
-                frame_predictions.append({
-                    "frame": idx + 1,
-                    "label": label,
-                    "confidence": float(round(confidence, 4)),  # Ensure it's a float, not tensor
-                    "thumbnail": img_data_uri
-                })
+                if frame_faces is not None:
+                    face_detector.draw_faces(img_cv, frame_faces[idx])
+
+                # Encode for frontend straight from the BGR frame
+                frame_prediction["thumbnail"] = render_image(img_cv, media, image_format, image_quality)
+
+            if frame_idxs is not None:
+                # Adaptive samples are unevenly spaced; report where each came from
+                frame_prediction["frame_index"] = int(frame_idxs[idx])
+            frame_predictions.append(frame_prediction)
+            report("frame", frame_prediction)
 
         # Handle empty predictions
         if not frame_predictions:
@@ -114,17 +246,31 @@ async def predict_video(file):
         final_confidences = [fp["confidence"] for fp in frame_predictions if fp["label"] == final_label]
         avg_confidence = sum(final_confidences) / len(final_confidences) if final_confidences else 0.0
 
-        # Clean up
-        os.remove(temp_path)
-
         # Return results
-        return {
+        result = {
             "frame_predictions": frame_predictions,
             "final": {
                 "label": final_label,
                 "confidence": float(round(avg_confidence, 4))  # Ensure it's a float
-            }
+            },
+            "frames_analyzed": len(frame_predictions),
+            "partial": partial
         }
+        if adaptive:
+            result["early_exit"] = early_exit
+        if frame_faces is not None:
+            result["frames_with_faces"] = sum(1 for faces in frame_faces if faces)
+
+        # Optional score from the LSTM run over the whole frame sequence
+        if sequence_prob is not None:
+            sequence_label = "Fake" if sequence_prob > 0.5 else "Real"
+            sequence_confidence = sequence_prob if sequence_label == "Fake" else 1 - sequence_prob
+            result["sequence"] = {
+                "label": sequence_label,
+                "confidence": float(round(sequence_confidence, 4))
+            }
+
+        return result
 
     except Exception as e:
         import traceback
@@ -0,0 +1,105 @@
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+from backend.metrics import span
+
+# Uploads are copied in fixed-size chunks so memory per request stays bounded
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_VIDEO_UPLOAD_BYTES = int(os.environ.get("MAX_VIDEO_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+MAX_IMAGE_UPLOAD_BYTES = int(os.environ.get("MAX_IMAGE_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_DOCUMENT_BYTES = int(os.environ.get("MAX_DOCUMENT_BYTES", str(50 * 1024 * 1024)))
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds its configured size limit"""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+def _check_declared_size(file, max_bytes):
+    # Reject early when the client already told us the size
+    if getattr(file, "size", None) is not None and file.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+
+async def iter_upload(file, max_bytes, chunk_size=None, digest=None):
+    """Yield the upload in chunks, enforcing max_bytes while streaming.
+
+    When given, `digest` (a hashlib object) is updated with every chunk.
+    """
+    _check_declared_size(file, max_bytes)
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    size = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        if digest is not None:
+            digest.update(chunk)
+        yield chunk
+
+
+@asynccontextmanager
+async def spooled_upload(file, max_bytes, suffix="", digest=None):
+    """Copy an UploadFile to a temp file and yield its path; the file is always removed"""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with span("upload"), os.fdopen(fd, "wb") as out:
+            async for chunk in iter_upload(file, max_bytes, digest=digest):
+                out.write(chunk)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def save_upload(file, max_bytes, path, digest=None):
+    """Copy an UploadFile to `path`, which the caller then owns; removed again on failure"""
+    try:
+        with span("upload"), open(path, "wb") as out:
+            async for chunk in iter_upload(file, max_bytes, digest=digest):
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+async def save_body(request, max_bytes, path):
+    """Copy a raw request body to `path`, which the caller then owns; removed again on failure"""
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+    size = 0
+    try:
+        with span("upload"), open(path, "wb") as out:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+async def read_upload(file, max_bytes):
+    """Read a small upload (e.g. an image) into memory, enforcing max_bytes"""
+    buffer = bytearray()
+    with span("upload"):
+        async for chunk in iter_upload(file, max_bytes):
+            buffer += chunk
+    return buffer
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.metrics import recording_spans
+
+
+def available_cores():
+    """CPUs this process may actually use: its affinity mask, capped by a cgroup CPU quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        # cgroup v2 (e.g. `docker run --cpus`): "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+def _init_worker(torch_threads):
+    # Split the cores between workers instead of every worker using all of them
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(torch_threads)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _feature_cache_stats():
+    video_model = sys.modules.get("backend.model_defs.video_model")
+    return video_model.feature_cache.stats() if video_model is not None else None
+
+
+def call_in_worker(fn, *args, **kwargs):
+    """Run fn in a worker process and return (result, spans, pid, feature cache stats).
+
+    A worker's own histograms and caches are invisible to the API process,
+    so the stage timings and cache figures travel back with every result.
+    """
+    with recording_spans() as spans:
+        result = fn(*args, **kwargs)
+    return result, spans, os.getpid(), _feature_cache_stats()
+
+
+def combine_cache_stats(caches):
+    """One FeatureCache.stats()-shaped summary of several processes' caches"""
+    hits = sum(cache["hits"] for cache in caches)
+    misses = sum(cache["misses"] for cache in caches)
+    return {
+        "frames": sum(cache["frames"] for cache in caches),
+        "max_frames": sum(cache["max_frames"] for cache in caches),
+        "hash": caches[0]["hash"],
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "processes": len(caches),
+    }
+
+
+class SharedModelPool:
+    """Forked inference workers that inherit the parent's already loaded models.
+
+    The parent loads the models first and moves their weights into shared
+    memory (torch's share_memory), then forks every worker at once. Workers
+    reach the weights through inherited module globals, so N workers cost one
+    copy of the weights rather than N, and touching Python objects in a worker
+    can't copy-on-write the tensor storage. Calls travel over the executor's
+    local call queue, like any ProcessPoolExecutor.
+    """
+
+    def __init__(self, workers, torch_threads=None):
+        self.workers = workers
+        self.torch_threads = torch_threads or max(1, available_cores() // workers)
+        self._pool = None
+
+    def start(self):
+        """Share the weights of the models loaded so far, then fork the workers"""
+        registry = sys.modules.get("backend.model_defs.registry")
+        if registry is not None:
+            registry.share_memory()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self.torch_threads,),
+        )
+        # With fork, the first submit starts every worker; do it now, before serving
+        # starts more threads in this process
+        for future in [self._pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        return self._pool
+
+    @property
+    def pool(self):
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "started": self._pool is not None,
+        }
@@ -0,0 +1,71 @@
+"""Compare two benchmark reports from benchmarks.run, e.g. before and after a change.
+
+    python -m benchmarks.compare base.json head.json --threshold 10
+
+Exits with status 1 when any scenario's p95 latency or peak RSS grew by more
+than --threshold percent, or its throughput dropped by more than that.
+"""
+import argparse
+import json
+import sys
+
+# Metric -> whether a larger value is worse
+METRICS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "p99_ms": True,
+    "throughput_rps": False,
+    "rss_peak_mb": True,
+}
+# Metrics that count as regressions for the exit status
+GATED = ("p95_ms", "throughput_rps", "rss_peak_mb")
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {(r["scenario"], r["concurrency"]): r for r in report["results"]}
+
+
+def change(base, head):
+    return (head - base) / base * 100 if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    base_meta, base = load(args.base)
+    head_meta, head = load(args.head)
+    print(f"base {base_meta.get('commit')}  head {head_meta.get('commit')}")
+    if base_meta.get("stand_ins") != head_meta.get("stand_ins"):
+        print("warning: the reports were taken with different stand-in models")
+
+    header = f"{'scenario':<16}{'conc':>5}" + "".join(f"{metric:>22}" for metric in METRICS)
+    print(header)
+    regressions = []
+    for key in sorted(set(base) & set(head)):
+        row = f"{key[0]:<16}{key[1]:>5}"
+        for metric, larger_is_worse in METRICS.items():
+            delta = change(base[key][metric], head[key][metric])
+            row += f"{head[key][metric]:>12.1f} ({delta:+6.1f}%)"
+            worse = delta if larger_is_worse else -delta
+            if metric in GATED and worse > args.threshold:
+                regressions.append(f"{key[0]} @ {key[1]}: {metric} {delta:+.1f}%")
+        print(row)
+
+    for key in sorted(set(base) ^ set(head)):
+        print(f"{key[0]} @ {key[1]}: only in {'base' if key in base else 'head'}")
+
+    if regressions:
+        print("\nRegressions over the threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Offline latency / throughput / memory benchmark of the detection endpoints.
+
+Requests go through the real FastAPI app in-process (middleware, executor,
+micro-batching, model code) with synthetic inputs. Missing checkpoints are
+replaced by randomly initialised stand-ins, recorded in the report's meta.
+
+    python -m benchmarks.run --scenarios text,image,video --concurrency 1,4,8 --output bench.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks import synthetic
+
+# Scenario -> modality it needs loaded
+SCENARIOS = {
+    "text": "text",
+    "text_explain": "text",
+    "document": "text",
+    "image": "image",
+    "image_heatmap": "image",
+    "video": "video",
+    "video_adaptive": "video",
+}
+
+# Distinct synthetic inputs cycled through by the image and video scenarios
+NUM_IMAGES = 8
+NUM_VIDEOS = 4
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is the lifetime peak (KB on Linux, bytes on macOS); the best we have here
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Samples RSS on a background thread to find the peak while a block runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class Inputs:
+    """Synthetic request payloads, built once and reused across concurrency levels"""
+
+    def __init__(self, scenarios, workdir, text_words, image_size, video_frames):
+        self.text_words = text_words
+        self.images = []
+        self.videos = []
+        if any(SCENARIOS[s] == "image" for s in scenarios):
+            width, height = image_size
+            self.images = [synthetic.make_image(seed, width, height) for seed in range(NUM_IMAGES)]
+        if any(SCENARIOS[s] == "video" for s in scenarios):
+            for seed in range(NUM_VIDEOS):
+                path = synthetic.make_video(os.path.join(workdir, f"bench-{seed}.avi"), seed, frames=video_frames)
+                with open(path, "rb") as f:
+                    self.videos.append(f.read())
+
+    def request(self, scenario, i):
+        """httpx request arguments for the i-th request of a scenario"""
+        if scenario == "text":
+            return {"method": "POST", "url": "/text-detect", "json": {"text": synthetic.make_text(i, self.text_words)}}
+        if scenario == "text_explain":
+            return {"method": "POST", "url": "/text-detect",
+                    "json": {"text": synthetic.make_text(i, self.text_words), "explain": True}}
+        if scenario == "document":
+            return {"method": "POST", "url": "/text-detect/document",
+                    "content": synthetic.make_document(i).encode("utf-8")}
+        if scenario in ("image", "image_heatmap"):
+            data = {"explain": "true"} if scenario == "image_heatmap" else {}
+            files = {"file": (f"bench-{i}.jpg", self.images[i % len(self.images)], "image/jpeg")}
+            return {"method": "POST", "url": "/image-detect", "files": files, "data": data}
+        if scenario in ("video", "video_adaptive"):
+            url = "/video-detect?adaptive=true" if scenario == "video_adaptive" else "/video-detect"
+            files = {"file": (f"bench-{i}.avi", self.videos[i % len(self.videos)], "video/x-msvideo")}
+            return {"method": "POST", "url": url, "files": files}
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def failed(response):
+    if response.status_code != 200:
+        return True
+    if response.headers.get("content-type", "").startswith("application/x-ndjson"):
+        # Failures, in-band or in the verdict, always end the stream
+        lines = response.text.strip().splitlines()
+        return not lines or "error" in json.loads(lines[-1])
+    body = response.json()
+    return isinstance(body, dict) and "error" in body
+
+
+async def run_level(client, inputs, scenario, concurrency, requests):
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            response = await client.request(**inputs.request(scenario, i))
+            latencies.append(time.perf_counter() - started)
+            if failed(response):
+                errors += 1
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "throughput_rps": round(requests / wall, 3),
+        "rss_start_mb": round(rss.start / (1024 * 1024), 1),
+        "rss_peak_mb": round(rss.peak / (1024 * 1024), 1),
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": revision, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+async def benchmark(args, scenarios, workdir):
+    import httpx
+
+    # api mounts frontend/static, which isn't tracked in git
+    os.makedirs(os.path.join(os.path.dirname(__file__), "..", "frontend", "static"), exist_ok=True)
+    import api
+    from benchmarks import stand_ins
+
+    stand_ins_used = {}
+    if any(SCENARIOS[s] == "text" for s in scenarios):
+        stand_ins_used["text"] = stand_ins.install_text_stand_in()
+    if any(SCENARIOS[s] in ("image", "video") for s in scenarios):
+        stand_ins_used["deepfake"] = stand_ins.install_deepfake_stand_in()
+
+    inputs = Inputs(scenarios, workdir, args.text_words, args.image_size, args.video_frames)
+    results = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app), httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                                        timeout=None) as client:
+        load_started = time.perf_counter()
+        for modality in sorted({SCENARIOS[s] for s in scenarios}):
+            await api.lifecycle.get(modality)
+        load_seconds = time.perf_counter() - load_started
+
+        for scenario in scenarios:
+            # Warm-up requests (lazy pools, allocator, first-call compilation) aren't measured
+            for i in range(args.warmup):
+                await client.request(**inputs.request(scenario, 1_000_000 + i))
+            for concurrency in args.concurrency:
+                result = await run_level(client, inputs, scenario, concurrency, max(args.requests, concurrency))
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+
+    import torch
+    return {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "stand_ins": stand_ins_used,
+            "model_load_seconds": round(load_seconds, 2),
+            "models": api.model_memory_report(),
+            "args": {key: value for key, value in vars(args).items() if key != "output"},
+        },
+        "results": results,
+    }
+
+
+def parse_size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection endpoints with synthetic inputs")
+    parser.add_argument("--scenarios", default="text,image,image_heatmap,video",
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests per scenario")
+    parser.add_argument("--text-words", type=int, default=120)
+    parser.add_argument("--image-size", type=parse_size, default=(640, 480), help="WIDTHxHEIGHT")
+    parser.add_argument("--video-frames", type=int, default=60)
+    parser.add_argument("--with-cache", action="store_true",
+                        help="keep the result and feature caches on (by default every request is a miss)")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Must be settled before api and the model modules are imported
+    os.environ["ENABLED_MODALITIES"] = ",".join(sorted({SCENARIOS[s] for s in scenarios}))
+    os.environ["MODEL_LOADING"] = "lazy"
+    if not args.with_cache:
+        os.environ["RESULT_CACHE_MAX_ENTRIES"] = "0"
+        os.environ["FEATURE_CACHE_MAX_FRAMES"] = "0"
+
+    with tempfile.TemporaryDirectory(prefix="aidetect-bench-") as workdir:
+        report = asyncio.run(benchmark(args, scenarios, workdir))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import types
+import zlib
+
+import numpy as np
+
+TEXT_MODULE = "backend.model_defs.text_model"
+
+
+def install_deepfake_stand_in():
+    """Serve a randomly initialised ResNeXt + LSTM when the checkpoint is missing.
+
+    Same architecture and inference engine as production, so latency and
+    memory are representative; the scores are meaningless. Returns True
+    when the stand-in is used.
+    """
+    from backend.model_defs import registry
+
+    if os.path.exists(registry.DEEPFAKE_MODEL_PATH):
+        return False
+
+    def load_stand_in():
+        import torch
+        from backend.model_defs import engine
+        from backend.model_defs.model import DeepfakeDetectionModel
+
+        torch.manual_seed(0)
+        return engine.prepare(DeepfakeDetectionModel().eval())
+
+    registry.LOADERS["deepfake"] = load_stand_in
+    return True
+
+
+class StandInTextModel:
+    """Hashed bag-of-words MLP with random weights, mirroring text_model's interface"""
+
+    def __init__(self, dim=256, buckets=1 << 15, seed=0):
+        rng = np.random.default_rng(seed)
+        self.buckets = buckets
+        self.embedding = rng.normal(0, 0.1, (buckets, dim)).astype(np.float32)
+        self.hidden = rng.normal(0, 0.1, (dim, dim)).astype(np.float32)
+        self.output = rng.normal(0, 0.1, (dim,)).astype(np.float32)
+
+    def score_texts(self, texts):
+        scores = []
+        for text in texts:
+            ids = [zlib.crc32(token.encode()) % self.buckets for token in text.lower().split()] or [0]
+            pooled = self.embedding[ids].mean(axis=0)
+            hidden = np.maximum(pooled @ self.hidden, 0)
+            scores.append(float(1 / (1 + np.exp(-hidden @ self.output))))
+        return scores
+
+
+def install_text_stand_in():
+    """Register a stand-in text_model module when TensorFlow or the saved models are missing.
+
+    Returns True when the stand-in is used.
+    """
+    models_dir = os.path.join(os.path.dirname(__file__), "..", "backend", "models", "text")
+    try:
+        import tensorflow  # noqa: F401
+        import tensorflow_text  # noqa: F401
+        if os.path.isdir(os.path.join(models_dir, "ai_text_model")):
+            return False
+    except ImportError:
+        pass
+
+    stand_in = StandInTextModel()
+    module = types.ModuleType(TEXT_MODULE)
+    module.MODEL_VERSION = "stand-in"
+    module.score_texts = stand_in.score_texts
+
+    def label_score(score):
+        label = "AI-generated" if score > 0.5 else "Human-written"
+        confidence = score if label == "AI-generated" else 1 - score
+        return {"label": label, "confidence": round(float(confidence), 4)}
+
+    def predict_texts(texts, batch_size=64):
+        return [label_score(score) if text.strip() else {"error": "Empty text"}
+                for text, score in zip(texts, stand_in.score_texts(texts))]
+
+    def generate_lime_explanation(text, label, num_features=10, num_samples=100):
+        # Same amount of model work as LIME: score num_samples word-dropout perturbations
+        rng = np.random.default_rng(0)
+        words = text.split()
+        samples = [" ".join(w for w in words if rng.random() > 0.3) for _ in range(num_samples)]
+        stand_in.score_texts(samples)
+        return {"lime_explanations": [f"Stand-in model detected {label} content"], "feature_weights": {}}
+
+    module.label_score = label_score
+    module.predict_texts = predict_texts
+    module.generate_lime_explanation = generate_lime_explanation
+    sys.modules[TEXT_MODULE] = module
+    return True
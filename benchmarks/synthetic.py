@@ -0,0 +1,68 @@
+import os
+
+import cv2
+import numpy as np
+
+WORDS = (
+    "the model of a system can be used to describe how data moves between layers while people "
+    "often write about their day and share short notes with friends about food travel work and "
+    "weather however generated text tends to repeat balanced phrases such as in conclusion it is "
+    "important to note that many factors contribute to this outcome furthermore research shows"
+).split()
+
+
+def make_text(seed, words=120):
+    """Deterministic pseudo-prose of roughly `words` words"""
+    rng = np.random.default_rng(seed)
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, int(rng.integers(6, 20)))
+        sentence = " ".join(rng.choice(WORDS, size=length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def make_document(seed, paragraphs=40, words=80):
+    return "\n\n".join(make_text(seed * 1000 + i, words) for i in range(paragraphs))
+
+
+def draw_scene(rng, width, height, shift=0):
+    """A smooth gradient with a few filled shapes: cheap, but not trivially compressible"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        127 + 100 * np.sin((x + shift) / (width / 3.0)),
+        127 + 100 * np.cos((y + shift) / (height / 2.0)),
+        127 + 100 * np.sin((x + y) / (width / 2.0)),
+    ], axis=-1)
+    image = np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+    for _ in range(5):
+        center = (int(rng.integers(0, width)) + shift) % width, int(rng.integers(0, height))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(image, center, int(rng.integers(10, max(11, min(width, height) // 4))), color, -1)
+    return image
+
+
+def make_image(seed, width=640, height=480, ext=".jpg"):
+    """Encoded bytes of a deterministic synthetic BGR image"""
+    image = draw_scene(np.random.default_rng(seed), width, height)
+    ok, buffer = cv2.imencode(ext, image)
+    if not ok:
+        raise RuntimeError(f"Could not encode synthetic image as {ext}")
+    return buffer.tobytes()
+
+
+def make_video(path, seed, frames=60, width=320, height=240, fps=25):
+    """Write a deterministic MJPG AVI with shapes drifting across frames; returns path"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open a video writer for {path}")
+    try:
+        for i in range(frames):
+            # Same shapes every frame, shifted, so frames differ like real footage
+            writer.write(draw_scene(np.random.default_rng(seed), width, height, shift=i * 4))
+    finally:
+        writer.release()
+    return path
@@ -454,6 +454,7 @@ document.addEventListener("DOMContentLoaded", function () {
       
       const formData = new FormData();
       formData.append("file", file);
+      formData.append("explain", "true");  // Request the explanation heatmap from backend
       
       try {
         const response = await fetch("http://localhost:8000/image-detect", {
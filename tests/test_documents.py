@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from backend.documents import DocumentSegmenter
+
+PIECES = ["word", "x" * 50, "Sentence.", "Wow!!", " ", "  ", "\n", "\n\n", "\r\n", "\r\n\r\n", "\n \n", "\t",
+          'end." ', "? "]
+
+
+def segment(text, chunk_sizes=None, seed=0, **options):
+    """Segments of text fed whole, or in chunks of sizes drawn from chunk_sizes"""
+    segmenter = DocumentSegmenter(**options)
+    rng = random.Random(seed)
+    segments = []
+    position = 0
+    while position < len(text):
+        size = rng.choice(chunk_sizes) if chunk_sizes else len(text)
+        segments += segmenter.feed(text[position:position + size])
+        position += size
+    return segments + segmenter.close()
+
+
+def random_documents(count=150, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 300)))
+
+
+@pytest.mark.parametrize("mode", ["sentence", "paragraph"])
+@pytest.mark.parametrize("window", [1, 3])
+@pytest.mark.parametrize("max_chars", [20, 200])
+def test_segments_do_not_depend_on_chunking(mode, window, max_chars):
+    for text in random_documents():
+        whole = segment(text, mode=mode, window=window, max_chars=max_chars)
+        for chunk_sizes in ([1], [1, 2, 3, 7], [13, 50]):
+            assert segment(text, chunk_sizes, mode=mode, window=window, max_chars=max_chars) == whole
+
+
+@pytest.mark.parametrize("mode", ["sentence", "paragraph"])
+def test_segments_fit_max_chars_and_point_into_the_text(mode):
+    for text in random_documents(seed=1):
+        for seg in segment(text, [1, 5, 64], mode=mode, window=2, max_chars=60):
+            assert len(seg["text"]) <= 60
+            assert text[seg["start"]:seg["end"]].split() == seg["text"].split()
+
+
+def test_long_paragraph_inside_one_chunk_is_cut():
+    text = "Intro.\n\n" + "word " * 100_000 + "\n\nOutro."
+    segments = segment(text, mode="paragraph", max_chars=2000)
+    assert max(len(seg["text"]) for seg in segments) <= 2000
+    assert segments[0]["text"] == "Intro." and segments[-1]["text"] == "Outro."
+
+
+def test_crlf_paragraph_offsets():
+    text = "Line one.\r\n\r\nPara two here.\r\n\r\nPara three."
+    segments = segment(text, mode="paragraph")
+    assert [text[seg["start"]:seg["end"]] for seg in segments] == ["Line one.", "Para two here.", "Para three."]